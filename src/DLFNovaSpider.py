@@ -4,89 +4,106 @@ import re
 import os
 import json
 from datetime import date, datetime, time
+from typing import NamedTuple
 from zoneinfo import ZoneInfo
+from extraction import RowExtractor
+from metrics import timed
 from settings import DATA_PATH
+from items import PlaylistItem
+
+
+class NovaPlaylistRow(NamedTuple):
+    date_time: str | None
+    title: str | None
+    performer: str | None
+
+
+PLAYLIST_ROWS = RowExtractor(
+    NovaPlaylistRow,
+    rows='ul.playlist.day1 li.item figure figcaption',
+    fields={
+        'date_time': 'small::text',
+        'title': 'h3 div.title::text',
+        'performer': 'h3 div.artist::text',
+    },
+)
+
+TIME_PATTERN = re.compile("((\\d+)\\. ([^\\W\\d_]+))[\\s]*\\|[\\s]*((\\d+):(\\d+))")
+
+MONTHS = {
+    "Januar": 1, "Februar": 2, "März": 3, "April": 4, "Mai": 5, "Juni": 6,
+    "Juli": 7, "August": 8, "September": 9, "Oktober": 10, "November": 11, "Dezember": 12,
+}
+
 
 class DLFNovaSpider(DownloadSpider):
     name = "DLFNova"
     # run daily
     interval = 60 * 60 * 24
     compress = True
+    conditional_get = True
 
     custom_settings = {
-        'DOWNLOAD_DELAY': 5, # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Start bei 5 Sekunden, AimdThrottle passt Delay und Parallelität anhand der 5xx/429-Antworten an.
+        'DOWNLOAD_DELAY': 5,
         'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'AIMD_THROTTLE_ENABLED': True,
+        'AIMD_THROTTLE_MIN_DELAY': 1,
+        'AIMD_THROTTLE_MAX_DELAY': 60,
+        'AIMD_THROTTLE_MAX_CONCURRENCY': 2,
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
     }
 
     def start_requests(self):
         yield scrapy.Request("https://www.deutschlandfunknova.de/playlist")
 
+    @timed
     def parse(self, response, **kwargs):
         super().save_response(response)
         # 'response' contains the page as seen by the browser
 
         playlist_data = []
 
-        playlist_items = response.css('ul.playlist.day1 li.item figure figcaption')
+        playlist_items = list(PLAYLIST_ROWS.extract(response))
+        fetched = self.response_time(response).astimezone(ZoneInfo("Europe/Berlin"))
 
         if not playlist_items:
             self.logger.warning(f"No playlist items found on {response.url}")
 
-        for item in playlist_items:
-            date_time = item.css('small::text').get()
+        # die Liste deckt den ganzen Tag ab, übernommen wird nur, was nach dem letzten Lauf gespielt wurde
+        watermark = self.get_watermark()
+        skipped = 0
+
+        for date_time, title, performer in playlist_items:
             if not date_time:
                 self.logger.warning(f"Missing time attribute in item on {response.url}")
                 continue
 
-            matches = re.search("((\\d+)\\. ([a-zA-Z]+))[\\s]*\\|[\\s]*((\\d+):(\\d+))", date_time)
-            if not matches:
+            matches = TIME_PATTERN.search(date_time)
+            if not matches or matches[3] not in MONTHS:
                 self.logger.warning(f"Missing time attribute in item on {response.url}")
                 continue
 
             day = int(matches[2])
             hour = int(matches[5])
             minute = int(matches[6])
-            month = 0
-            # I am sorry but this is the easiert way without adding any more dependencies...
-            match matches[3]:
-                case "Januar":
-                    month = 1
-                case "Februar":
-                    month = 2
-                case "März":
-                    month = 3
-                case "April":
-                    month = 4
-                case "Mai":
-                    month = 5
-                case "Juni":
-                    month = 6
-                case "Juli":
-                    month = 7
-                case "August":
-                    month = 8
-                case "September":
-                    month = 9
-                case "Oktober":
-                    month = 10
-                case "November":
-                    month = 11
-                case "Dezember":
-                    month = 12
-                case _:
-                    self.logger.warning(f"Missing time attribute in item on {response.url}")
-                    continue
-            
+            month = MONTHS[matches[3]]
+
             try:
-                dt = datetime(2025, month, day, hour, minute, tzinfo=ZoneInfo("Europe/Berlin"))
-                iso_ts = dt.isoformat(timespec="minutes")
+                dt = datetime(fetched.year, month, day, hour, minute, tzinfo=ZoneInfo("Europe/Berlin"))
+                # Die Seite nennt kein Jahr: Einträge "nach" dem Abruf stammen aus dem Vorjahr (Jahreswechsel)
+                if dt > fetched:
+                    dt = dt.replace(year=fetched.year - 1)
             except ValueError as e:
                 self.logger.error(f"Error parsing datetime string '{date_time}': {e}. Using raw value.")
                 iso_ts = date_time
-
-            title = item.css('h3 div.title::text').get()
-            performer = item.css('h3 div.artist::text').get()
+            else:
+                if watermark is not None and dt <= watermark:
+                    skipped += 1
+                    continue
+                self.raise_watermark(dt)
+                iso_ts = dt.isoformat(timespec="minutes")
 
             playlist_data.append({
                 'datetime': iso_ts,
@@ -94,16 +111,11 @@ class DLFNovaSpider(DownloadSpider):
                 'performer': performer.strip() if performer else None
             })
 
+        if skipped:
+            self.logger.info(f"Skipped {skipped} entries up to the watermark {watermark.isoformat()}")
+
         json_filename = self.generate_name(response, extension = ".json").replace(".html", ".json")
-        path = os.path.join(DATA_PATH, self.name, 'parsed', json_filename)
-
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(playlist_data, f, ensure_ascii=False, indent=4)
-            self.logger.info(f"Wrote {len(playlist_data)} entries to {path}")
-        except IOError as e:
-            self.logger.error(f"Could not write JSON to {path}: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred while writing JSON to {path}: {e}")
-
-        return {"url": response.url}
+        for entry in playlist_data:
+            yield PlaylistItem(source=self.name, parsed_file=json_filename, **entry)
+
+        yield {"url": response.url}
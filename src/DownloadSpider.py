@@ -1,11 +1,16 @@
 import mimetypes
 import os.path
-import gzip
 from os import PathLike
 from datetime import datetime, timezone
 import scrapy
+from scrapy import signals
 from scrapy.http.response import Response
+import profiling
+from metrics import REGISTRY, timed
 from settings import DATA_PATH
+from snapshot_writer import BackgroundWriter, write_snapshot
+from snapshot_store import SnapshotStore
+from state_store import RUN_FINISHED, RUN_PARTIAL, SLOT_FAILED, get_state_store
 from pathlib import Path
 
 
@@ -13,31 +18,219 @@ class DownloadSpider(scrapy.Spider):
     name = ""
     interval = None
     compress = False
+    # gzip-Level 6 statt 9: kaum größere Dateien, aber deutlich weniger CPU pro Snapshot
+    compress_level = 6
+    # maximale Anzahl noch nicht geschriebener Snapshots, danach pausiert die Engine,
+    # bis der Writer wieder auf die Hälfte abgearbeitet hat
+    max_pending_writes = 32
+    # identische Snapshots nur einmal im inhaltsadressierten SnapshotStore ablegen
+    deduplicate = False
+    # ETag/Last-Modified merken und unveränderte Seiten überspringen (ConditionalGetMiddleware)
+    conditional_get = False
+    # True, wenn gespeicherte Snapshots offline erneut geparst werden (reparse.py):
+    # dann werden weder Snapshots gespeichert noch Slots im StateStore markiert
+    replay = False
+    # Callback, durch den reparse.py die Snapshots dieses Spiders schickt
+    replay_callback = "parse"
+
+    writer: BackgroundWriter | None = None
+    snapshot_store: SnapshotStore | None = None
+    run_id: int | None = None
+    failed_slots = 0
+    # erfolgreiche Slots, deren Items noch nicht geschrieben sind, siehe mark_slot
+    pending_slots: list | None = None
+    failed_writes = False
+    # neuester Eintrag je Quelle in diesem Lauf, wird erst nach einem vollständigen Lauf übernommen
+    pending_watermarks: dict | None = None
+    # (Zeitspanne, Abrufzeit) der zuletzt geparsten Seite, für die adaptive Abfrage im Scheduler
+    observed_window: tuple | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        if profiling.enabled_for(spider.name):
+            profiling.install(spider, crawler)
+        return spider
+
+    def spider_opened(self, spider):
+        self.run_id = get_state_store().start_run(self.name)
+
+    def response_time(self, response: Response) -> datetime:
+        """Zeitpunkt, zu dem `response` geladen wurde, bei einem Replay der des Snapshots."""
+        snapshot_time = response.meta.get("snapshot_time") if response.request is not None else None
+        if snapshot_time:
+            return datetime.fromisoformat(snapshot_time)
+        return datetime.now(timezone.utc)
+
+    def snapshot_meta(self, name: str) -> dict | None:
+        """
+        Leitet aus dem Dateinamen eines gespeicherten Snapshots die `meta`-Werte ab,
+        die der Replay-Callback erwartet. `None`, wenn der Snapshot nicht erneut
+        geparst werden kann.
+        """
+        return {}
 
     def generate_name(self, response: Response, extension = ".html") -> str:
-        time = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        time = self.response_time(response).isoformat(timespec="seconds")
         type_raw = response.headers.get("Content-Type")
         if type_raw is not None:
             type = type_raw.decode("utf-8").split(";")[0]
             extension = mimetypes.guess_extension(type, False)
         return f"{self.name}_{time}{extension}"
 
-    def save_response(self, response: Response, path: PathLike | None = None, **kwargs):
+    def get_writer(self) -> BackgroundWriter:
+        if self.writer is None:
+            self.writer = BackgroundWriter(max_pending=self.max_pending_writes)
+        return self.writer
+
+    def get_snapshot_store(self) -> SnapshotStore:
+        if self.snapshot_store is None:
+            self.snapshot_store = SnapshotStore(self.name)
+        return self.snapshot_store
+
+    @timed
+    def save_response(self, response: Response, path: PathLike | None = None, prefix: str = "", **kwargs):
         if not self.name:
             raise Exception(
                 "The spider must have a valid name attribute. Please add name to the class."
             )
 
         if path is None:
-            path = Path(self.generate_name(response))
+            path = Path(prefix + self.generate_name(response))
 
         directory = str(os.path.join(DATA_PATH, self.name))
         parsed_directory = str(os.path.join(directory, 'parsed'))
         Path(parsed_directory).mkdir(parents=True, exist_ok=True)
+        if self.replay:
+            return
+
+        if self.deduplicate:
+            # im Reactor-Thread anlegen, nicht gleichzeitig in mehreren Writer-Threads
+            self.get_snapshot_store()
+        # Komprimieren und Schreiben passiert im Hintergrund, damit der Reactor nicht blockiert
+        writer = self.get_writer()
+        deferred = writer.submit(self.store_snapshot, response.body, str(path), datetime.now(timezone.utc))
+        deferred.addErrback(lambda failure: self.logger.error(f"Could not write snapshot {path}: {failure.value}"))
+        if writer.full:
+            self.pause_for_writer(writer)
+
+    def pause_for_writer(self, writer: BackgroundWriter):
+        """
+        Backpressure ohne den Reactor zu blockieren: Die Engine holt keine neuen Anfragen mehr,
+        bis der Writer auf die Hälfte von `max_pending_writes` abgearbeitet hat.
+        """
+        engine = getattr(self.crawler, "engine", None) if hasattr(self, "crawler") else None
+        if engine is None or engine.paused:
+            return
+        engine.pause()
+        REGISTRY.inc("writer_pauses_total", spider=self.name)
+
+        def resume(_):
+            engine.unpause()
+            # nicht auf den nächsten Heartbeat der Engine (5 s) warten
+            if engine.slot is not None:
+                engine.slot.nextcall.schedule()
+
+        writer.drained(writer.max_pending // 2).addCallback(resume)
 
-        if self.compress:
-            with gzip.open(os.path.join(directory, path) + ".gz", "wb") as f:
-                f.write(response.body)
+    @timed
+    def store_snapshot(self, body: bytes, path: str, timestamp: datetime):
+        """Läuft im Writer-Thread."""
+        if self.deduplicate:
+            self.get_snapshot_store().put(body, path, timestamp, self.compress_level)
+        elif self.compress:
+            write_snapshot(os.path.join(DATA_PATH, self.name, path) + ".gz", body, self.compress_level)
         else:
-            with open(os.path.join(directory, path), "wb") as f:
-                f.write(response.body)
+            write_snapshot(os.path.join(DATA_PATH, self.name, path), body)
+        REGISTRY.inc("written_bytes_total", len(body), spider=self.name)
+
+    def mark_slot(self, date: str, hour: int, status: str, bytes: int = 0, items: int = 0, source: str | None = None):
+        """
+        Hält fest, ob ein `(date, hour)`-Slot dieses Spiders (bzw. einer seiner Quellen) geladen wurde.
+        Fehlschläge werden sofort gespeichert, erfolgreiche Slots erst, wenn die bis dahin
+        erzeugten Items geschrieben sind (`ParsedOutputPipeline`, spätestens `finish_run`).
+        """
+        if self.replay:
+            return
+        slot = (source or self.name, date, hour, status, bytes, items)
+        if status == SLOT_FAILED:
+            self.store_slots([slot], failed=True)
+            return
+        if self.pending_slots is None:
+            self.pending_slots = []
+        self.pending_slots.append(slot)
+
+    def take_pending_slots(self) -> list:
+        """Slots, deren Items bis jetzt alle an die Pipelines übergeben sind."""
+        slots, self.pending_slots = self.pending_slots or [], []
+        return slots
+
+    def store_slots(self, slots: list, failed: bool = False):
+        """Speichert `slots`; mit `failed` (oder nach einem fehlgeschlagenen Schreiben) als `SLOT_FAILED`."""
+        failed = failed or self.failed_writes
+        for source, date, hour, status, bytes, items in slots:
+            if failed:
+                status = SLOT_FAILED
+                self.failed_slots += 1
+            get_state_store().mark_slot(source, date, hour, status, bytes=bytes, items=items)
+
+    def writes_failed(self, slots: list):
+        """Ein Batch der Pipeline konnte nicht geschrieben werden: betroffene und alle weiteren Slots scheitern."""
+        self.failed_writes = True
+        self.store_slots(slots)
+
+    def get_watermark(self, source: str | None = None) -> datetime | None:
+        """
+        Zeitpunkt des neuesten Eintrags von `source` (Standard: der Spider-Name), der in einem
+        früheren Lauf übernommen wurde. Beim Replay immer `None`, dort wird alles geparst.
+        """
+        if self.replay:
+            return None
+        value = get_state_store().watermark(source or self.name)
+        return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+    def raise_watermark(self, value: datetime, source: str | None = None):
+        """Merkt sich `value` als neuesten Eintrag; gespeichert wird erst in `finish_run`."""
+        if self.replay:
+            return
+        if self.pending_watermarks is None:
+            self.pending_watermarks = {}
+        source = source or self.name
+        timestamp = value.timestamp()
+        if timestamp > self.pending_watermarks.get(source, float("-inf")):
+            self.pending_watermarks[source] = timestamp
+
+    def observe_window(self, oldest: datetime, newest: datetime, fetched: datetime):
+        """
+        Merkt sich, welche Zeitspanne eine Seite mit rollierender Liste beim Abruf `fetched`
+        zeigte. Daraus berechnet der Scheduler den nächsten Abruf (`registry.adaptive_run_time`).
+        """
+        if self.replay or newest <= oldest:
+            return
+        self.observed_window = ((newest - oldest).total_seconds(), fetched.timestamp())
+
+    def finish_run(self, reason: str):
+        if self.run_id is None:
+            return
+        # hier sind alle Pipelines geschlossen und ihre Batches geschrieben
+        self.store_slots(self.take_pending_slots())
+        # Ein Lauf mit fehlgeschlagenen Slots gilt nicht als erledigt und wird beim nächsten Mal wiederholt
+        if reason == "finished":
+            status = RUN_PARTIAL if self.failed_slots else RUN_FINISHED
+        else:
+            status = reason
+        # Wasserstände nur nach einem vollständigen Lauf weiterschieben, sonst gingen Lücken verloren
+        if status == RUN_FINISHED and self.pending_watermarks:
+            get_state_store().advance_watermarks(self.pending_watermarks)
+        if reason == "finished" and self.observed_window is not None:
+            get_state_store().record_poll_window(self.name, *self.observed_window)
+        get_state_store().finish_run(self.run_id, status)
+
+    def closed(self, reason):
+        # Alle ausstehenden Snapshots schreiben, bevor der Lauf als beendet gilt
+        if self.writer is not None:
+            deferred = self.writer.close()
+            deferred.addCallback(lambda _: self.finish_run(reason))
+            return deferred
+        self.finish_run(reason)
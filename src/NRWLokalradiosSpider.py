@@ -4,53 +4,219 @@ import re
 import os
 import json
 from datetime import date, datetime, time, timedelta
+from urllib.parse import quote, urlencode
 from zoneinfo import ZoneInfo
+from extraction import iter_json_array
+from metrics import timed
 from settings import DATA_PATH
+from items import PlaylistItem
+from state_store import DAY_SLOT, SLOT_DONE, SLOT_EMPTY, SLOT_FAILED
+
+API_URL = "https://api-prod.nrwlokalradios.com/playlist/title"
+
+NRW_ZONE = ZoneInfo("Europe/Berlin")
+
+# Einträge pro Seite. Ein Tag hat deutlich weniger Einträge, im Normalfall bleibt es bei der
+# einen, bewährten Anfrage. Erst eine volle Seite löst eine weitere mit `page` aus.
+PAGE_SIZE = 1000
+# Ob die Schnittstelle `page` auswertet, ist nicht belegt: liefert sie dieselbe Seite erneut
+# oder wird diese Grenze erreicht, gilt der Tag als fehlgeschlagen statt als vollständig.
+MAX_PAGES = 5
+
+# Bis zur Umstellung auf mehrere Sender wurde nur diese Station geladen; sie behält ihren
+# Quellnamen (Archiv-Partition, Wasserstand, Slots) und ihre Dateinamen ohne Präfix.
+LEGACY_STATION = 28
+DEFAULT_STATIONS = (LEGACY_STATION,)
+
+SNAPSHOT_PREFIX = re.compile(r"station(\d+)_")
+
+
+def parse_stations(value) -> list:
+    """Stations-IDs aus einer Liste oder einem kommagetrennten String."""
+    if isinstance(value, str):
+        value = value.split(",")
+    return [int(station) for station in value if str(station).strip()]
+
 
 class NRWLokalradiosSpider(DownloadSpider):
+    """
+    Lädt die Playlists der NRW-Lokalradios für den Vortag.
+
+    Welche Sender geladen werden, kommt aus dem Spider-Argument `stations` (z.B.
+    `-a stations=28,31`), sonst aus der Einstellung `NRW_STATIONS`. Ist `NRW_STATIONS_URL`
+    gesetzt, wird die Liste stattdessen von dort geladen (JSON-Liste von IDs oder Objekten
+    mit `id`). Alle Sender laufen im selben Spider über den Verbindungspool von Scrapy;
+    `CONCURRENT_REQUESTS_PER_DOMAIN` begrenzt die gleichzeitigen Anfragen, AimdThrottle nimmt
+    Delay und Parallelität bei 5xx/429 zurück. Jeder Sender hat eigenen Wasserstand, eigene Slots und eine eigene
+    Partition im Archiv (`NRWLokalradios_<id>`).
+    """
+
     name = "NRWLokalradios"
     # run daily
     interval = 60 * 60 * 24
     compress = True
 
     custom_settings = {
-        'DOWNLOAD_DELAY': 5, # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
-        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Mehrere Sender teilen sich einen Slot: kurzer Start-Delay, dafür mehrere Anfragen parallel.
+        # AimdThrottle erhöht den Delay und senkt die Parallelität, sobald 5xx/429-Antworten kommen.
+        'DOWNLOAD_DELAY': 1,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'AIMD_THROTTLE_ENABLED': True,
+        'AIMD_THROTTLE_MIN_DELAY': 0.5,
+        'AIMD_THROTTLE_MAX_DELAY': 60,
+        'AIMD_THROTTLE_MAX_CONCURRENCY': 4,
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
     }
 
+    def __init__(self, stations=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stations = parse_stations(stations) if stations else None
+
+    def station_source(self, station: int) -> str:
+        return self.name if station == LEGACY_STATION else f"{self.name}_{station}"
+
+    def station_prefix(self, station: int) -> str:
+        return "" if station == LEGACY_STATION else f"station{station}_"
+
+    def snapshot_meta(self, name: str) -> dict | None:
+        matches = SNAPSHOT_PREFIX.match(name)
+        return {"station": int(matches[1]) if matches else LEGACY_STATION}
+
     def start_requests(self):
-        start_date = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
-        url = f"https://api-prod.nrwlokalradios.com/playlist/title?station=28&req_station=28&searchterm=&datefrom={start_date}%2000:00:00&dateto={start_date}%2023:59:59&pagesize=1000"
-        yield scrapy.Request(url)
+        if self.stations is None:
+            stations_url = self.settings.get("NRW_STATIONS_URL")
+            if stations_url:
+                yield scrapy.Request(stations_url, callback=self.parse_station_list, errback=self.stations_errback)
+                return
+            self.stations = parse_stations(self.settings.get("NRW_STATIONS", DEFAULT_STATIONS))
+        yield from self.day_requests(self.stations)
+
+    def parse_station_list(self, response):
+        stations = []
+        for entry in iter_json_array(response.text):
+            station = entry.get("id") if isinstance(entry, dict) else entry
+            if station is not None:
+                stations.append(int(station))
+        self.logger.info(f"Discovered {len(stations)} stations on {response.url}")
+        self.stations = stations
+        yield from self.day_requests(stations)
+
+    def stations_errback(self, failure):
+        self.logger.error(f"Could not load station list from {failure.request.url}: {failure.value}")
+        self.stations = parse_stations(self.settings.get("NRW_STATIONS", DEFAULT_STATIONS))
+        yield from self.day_requests(self.stations)
 
+    def day_requests(self, stations: list):
+        """
+        Erste Seite des Vortags für jeden Sender, ab dem Wasserstand seines letzten Laufs:
+        die Schnittstelle liefert dann nur Einträge, die noch nicht übernommen wurden.
+        """
+        day = date.today() - timedelta(days=1)
+        start = datetime.combine(day, time(0, 0), tzinfo=NRW_ZONE)
+        end = datetime.combine(day, time(23, 59, 59), tzinfo=NRW_ZONE)
+
+        for station in stations:
+            station_start = start
+            watermark = self.get_watermark(self.station_source(station))
+            if watermark is not None:
+                watermark = watermark.astimezone(NRW_ZONE)
+                if watermark >= end:
+                    self.logger.info(f"Nothing new for station {station} on {day}, watermark is at {watermark.isoformat()}")
+                    continue
+                station_start = max(start, watermark)
+            yield self.page_request(station, day.isoformat(), station_start, end, page=1)
+
+    def page_request(self, station: int, day: str, start: datetime, end: datetime, page: int, **meta) -> scrapy.Request:
+        params = {
+            "station": station,
+            "req_station": station,
+            "searchterm": "",
+            "datefrom": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "dateto": end.strftime("%Y-%m-%d %H:%M:%S"),
+            "pagesize": PAGE_SIZE,
+            "page": page,
+        }
+        return scrapy.Request(
+            f"{API_URL}?{urlencode(params, quote_via=quote)}",
+            callback=self.parse,
+            errback=self.page_errback,
+            meta={"station": station, "day": day, "start": start, "end": end, "page": page, **meta},
+        )
+
+    def page_errback(self, failure):
+        meta = failure.request.meta
+        self.logger.error(f"Could not load {failure.request.url}: {failure.value}")
+        self.mark_slot(meta["day"], DAY_SLOT, SLOT_FAILED, source=self.station_source(meta["station"]))
+
+    @timed
     def parse(self, response, **kwargs):
-        super().save_response(response)
+        """
+        Liest eine Seite der Schnittstelle. Übernommen werden nur Einträge nach dem
+        Wasserstand des Senders; ist die Seite voll, wird die nächste angefordert.
+        """
+        station = response.meta.get("station", LEGACY_STATION)
+        source = self.station_source(station)
+        page = response.meta.get("page", 1)
+        prefix = self.station_prefix(station) + (f"page{page}_" if page > 1 else "")
+        super().save_response(response, prefix=prefix)
 
-        playlist_data = []
+        # alle Seiten eines Senders landen in derselben Datei unter parsed/
+        json_filename = response.meta.get("parsed_file") or (
+            self.station_prefix(station) + self.generate_name(response, extension=".json").replace(".html", ".json")
+        )
+        watermark = self.get_watermark(source)
 
-        json_response = json.loads(response.text)
+        rows = 0
+        items = response.meta.get("items", 0)
+        first_row = None
+        for row in iter_json_array(response.text):
+            rows += 1
+            if first_row is None:
+                first_row = (row.get("timeslot_iso"), row.get("title"))
+            played = self.played_at(row)
+            if played is None or (watermark is not None and played <= watermark):
+                continue
+            self.raise_watermark(played, source)
+            items += 1
+            yield PlaylistItem(
+                source=source,
+                parsed_file=json_filename,
+                datetime=row['timeslot_iso'],
+                title=row['title'],
+                performer=row['artist'],
+            )
 
-        if not json_response:
+        if not rows and page == 1:
             self.logger.warning(f"No playlist items found on {response.url}")
 
-        for item in json_response:
-            playlist_data.append({
-                'datetime': item['timeslot_iso'],
-                'title': item['title'],
-                'performer': item['artist']
-            })
+        yield {"url": response.url}
+
+        if self.replay or "day" not in response.meta:
+            return
 
-        json_filename = self.generate_name(response, extension = ".json").replace(".html", ".json")
-        path = os.path.join(DATA_PATH, self.name, 'parsed', json_filename)
+        day = response.meta["day"]
+        if rows < PAGE_SIZE:
+            self.mark_slot(day, DAY_SLOT, SLOT_DONE if items else SLOT_EMPTY, items=items, source=source)
+        elif first_row == response.meta.get("first_row"):
+            # die Schnittstelle ignoriert `page`: der Rest des Tages ist nicht erreichbar
+            self.logger.error(f"Page {page} of station {station} on {day} repeats the previous page, marking the day as failed")
+            self.mark_slot(day, DAY_SLOT, SLOT_FAILED, items=items, source=source)
+        elif page >= MAX_PAGES:
+            self.logger.error(f"Station {station} on {day} still has full pages after {MAX_PAGES} pages, marking the day as failed")
+            self.mark_slot(day, DAY_SLOT, SLOT_FAILED, items=items, source=source)
+        else:
+            yield self.page_request(
+                station, day, response.meta["start"], response.meta["end"], page + 1,
+                parsed_file=json_filename, items=items, first_row=first_row,
+            )
 
+    def played_at(self, row: dict) -> datetime | None:
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(playlist_data, f, ensure_ascii=False, indent=4)
-            self.logger.info(f"Wrote {len(playlist_data)} entries to {path}")
-        except IOError as e:
-            self.logger.error(f"Could not write JSON to {path}: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred while writing JSON to {path}: {e}")
-
-        return {"url": response.url}
\ No newline at end of file
+            played = datetime.fromisoformat(row["timeslot_iso"])
+        except (KeyError, TypeError, ValueError):
+            self.logger.warning(f"Invalid timeslot in playlist item {row!r}")
+            return None
+        if played.tzinfo is None:
+            played = played.replace(tzinfo=NRW_ZONE)
+        return played
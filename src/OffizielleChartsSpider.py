@@ -5,23 +5,33 @@ import os
 import datetime
 import json
 from zoneinfo import ZoneInfo
+from metrics import timed
 from settings import DATA_PATH
+from items import ChartEntry
 
 class OffizielleChartsSpider(DownloadSpider):
     name = "OffizielleCharts"
     # run weekly
     interval = 60 * 60 * 24 * 7
     compress = True
+    conditional_get = True
 
     custom_settings = {
-        'DOWNLOAD_DELAY': 5, # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Start bei 5 Sekunden, AimdThrottle passt Delay und Parallelität anhand der 5xx/429-Antworten an.
+        'DOWNLOAD_DELAY': 5,
         'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'AIMD_THROTTLE_ENABLED': True,
+        'AIMD_THROTTLE_MIN_DELAY': 1,
+        'AIMD_THROTTLE_MAX_DELAY': 60,
+        'AIMD_THROTTLE_MAX_CONCURRENCY': 2,
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
     }
 
     def start_requests(self):
         yield scrapy.Request("https://www.offiziellecharts.de/charts/single")
 
+    @timed
     def parse(self, response, **kwargs):
         super().save_response(response)
         # 'response' contains the page as seen by the browser
@@ -45,6 +55,7 @@ class OffizielleChartsSpider(DownloadSpider):
             print(iso_ts_from)
             print(iso_ts_to)
         
+        json_filename = self.generate_name(response, extension = ".json").replace(".html", ".json")
         chartlist_items = response.css('table.chart-table tr')
         for index, item in enumerate(chartlist_items):
             performer = item.css('td.ch-info span.info-artist::text').get()
@@ -52,25 +63,15 @@ class OffizielleChartsSpider(DownloadSpider):
             position = item.css('td.ch-pos span.this-week::text').get()
             position_old = item.css('td.ch-trend span.last-week::text').get()
             
-            chartlist_data.append({
-                'datetime_from': iso_ts_from,
-                'datetime_to': iso_ts_to,
-                'position': position.strip() if position else index,
-                'position_old': position_old.strip() if position_old else None,
-                'perfomer': performer.strip() if performer else None,
-                'title': title.strip() if title else None,
-            })
-
-        json_filename = self.generate_name(response, extension = ".json").replace(".html", ".json")
-        path = os.path.join(DATA_PATH, self.name, 'parsed', json_filename)
-
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(chartlist_data, f, ensure_ascii=False, indent=4)
-            self.logger.info(f"Wrote {len(chartlist_data)} entries to {path}")
-        except IOError as e:
-            self.logger.error(f"Could not write JSON to {path}: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred while writing JSON to {path}: {e}")
+            chartlist_data.append(ChartEntry(
+                datetime_from=iso_ts_from,
+                datetime_to=iso_ts_to,
+                position=position.strip() if position else index,
+                position_old=position_old.strip() if position_old else None,
+                perfomer=performer.strip() if performer else None,
+                title=title.strip() if title else None,
+                parsed_file=json_filename,
+            ))
 
-        return {"url": response.url}
\ No newline at end of file
+        yield from chartlist_data
+        yield {"url": response.url}
\ No newline at end of file
@@ -3,8 +3,10 @@ import DownloadSpider # Importiere die Basisklasse
 import json
 from datetime import datetime
 import os
+from metrics import timed
 from settings import DATA_PATH
 from scrapy_playwright.page import PageMethod
+from playwright_contexts import landing_page_meta, landing_page_settings
 
 class SRF3LandingPage(DownloadSpider.DownloadSpider):
     """
@@ -15,6 +17,9 @@ class SRF3LandingPage(DownloadSpider.DownloadSpider):
     # run hourly
     interval = 60 * 60
     compress = True
+    deduplicate = True
+
+    custom_settings = landing_page_settings(first_party_domains=("srf.ch", "srgssr.ch"))
 
     def start_requests(self):
         """
@@ -24,15 +29,13 @@ class SRF3LandingPage(DownloadSpider.DownloadSpider):
         """
         yield scrapy.Request(
             "https://www.srf.ch/radio-srf-3",
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_selector", 'div.radio-content-header__slot--third .radio-content-header-teaser__title', timeout=15000),
-                    PageMethod("wait_for_selector", 'span.teaser__title', timeout=15000)
-                ]
-            }
+            meta=landing_page_meta([
+                PageMethod("wait_for_selector", 'div.radio-content-header__slot--third .radio-content-header-teaser__title', timeout=15000),
+                PageMethod("wait_for_selector", 'span.teaser__title', timeout=15000)
+            ])
         )
 
+    @timed
     def parse(self, response, **kwargs):
         """
         Parst die Antwort der SRF 3-Webseite.
@@ -1,13 +1,50 @@
 import scrapy
+from scrapy.http import Response, TextResponse
 from scrapy.http.response.html import HtmlResponse
 import json
 import os
-from datetime import datetime, date, timedelta
+import re
+from datetime import datetime, date, time, timedelta
+from typing import NamedTuple
 from zoneinfo import ZoneInfo
+from urllib.parse import urlencode
 from scrapy_playwright.page import PageMethod
 
 from DownloadSpider import DownloadSpider
+from extraction import RowExtractor
+from metrics import timed
 from settings import DATA_PATH
+from items import PlaylistItem
+from state_store import DAY_SLOT, SLOT_DONE, SLOT_EMPTY, SLOT_FAILED, get_state_store
+
+
+class SongLogRow(NamedTuple):
+    time: str | None
+    title: str | None
+    artist: str | None
+
+
+SONG_LOG_ROWS = RowExtractor(
+    SongLogRow,
+    rows='ol.songlog__list li.songlog__entry',
+    fields={
+        'time': '.songlog__time::text',
+        'title': '.songlog__song-title::text',
+        'artist': '.songlog__artist::text',
+    },
+)
+
+# Präfix der gespeicherten Snapshots, z.B. "2025-05-14_"
+SNAPSHOT_PREFIX = re.compile(r"(\d{4}-\d{2}-\d{2})_")
+
+SRF_ZONE = ZoneInfo("Europe/Zurich")
+
+# Song-Log-Schnittstelle des SRG-SSR-Integration-Layers, aus der auch die Seite "Gespielte Musik"
+# ihre Liste lädt. Überschreibbar über die Einstellung SRF3_SONG_LOG_URL (z.B. für einen lokalen Server).
+SONG_LOG_URL = "https://il.srgssr.ch/integrationlayer/2.0/srf/songList/radio/byChannel/dd0fa1ba-4ff6-4e1a-ab74-d7e49057d96f"
+# ein Tag hat gut 300 Titel, so reicht normalerweise eine Seite
+SONG_LOG_PAGE_SIZE = 500
+
 
 """
 SRF3PlaylistSpider ist ein Scrapy-Spider, der die Playlist-Daten von SRF3 abruft.
@@ -20,7 +57,7 @@ class SRF3PlaylistSpider(DownloadSpider):
     interval = 60 * 60 * 24
     compress = True
 
-    def __init__(self, start_date_param=None, end_date_param=None, *args, **kwargs):
+    def __init__(self, start_date_param=None, end_date_param=None, use_api="true", *args, **kwargs):
         """
         Initialisiert den Spider. Verarbeitet die übergebenen Start- und Enddaten,
         um eine Liste von Daten zu erstellen, für die Playlists abgerufen werden sollen.
@@ -31,6 +68,9 @@ class SRF3PlaylistSpider(DownloadSpider):
                                         Wenn `None`, wird das heutige Datum verwendet.
             end_date_param (str, optional): Das Enddatum für den Abruf im Format `YYYY-MM-DD`.
                                       Wenn `None`, wird das heutige Datum verwendet.
+            use_api (str, optional): Wenn nicht `"false"`/`"0"`, wird die Playlist direkt von der
+                                     Song-Log-Schnittstelle geladen und Playwright nur als
+                                     Rückfall verwendet. Standard: `"true"`.
             *args: Variable Argumentenliste, die an die Superklasse `DownloadSpider` weitergegeben wird.
             **kwargs: Variable Keyword-Argumentenliste, die an die Superklasse `DownloadSpider`
                       weitergegeben wird.
@@ -40,8 +80,9 @@ class SRF3PlaylistSpider(DownloadSpider):
                         wenn `end_date_param` vor `start_date_param` liegt.
         """
         super().__init__(*args, **kwargs)
+        self.use_api = str(use_api).lower() not in ("0", "false", "no")
 
-        today = datetime.now(ZoneInfo("Europe/Zurich")).date()
+        today = datetime.now(SRF_ZONE).date()
 
         if start_date_param:
             try:
@@ -69,12 +110,19 @@ class SRF3PlaylistSpider(DownloadSpider):
         if DATA_PATH:
             os.makedirs(DATA_PATH, exist_ok=True)
 
+    def snapshot_meta(self, name: str) -> dict | None:
+        matches = SNAPSHOT_PREFIX.match(name)
+        if not matches:
+            return None
+        return {"filename_date_str": matches[1]}
+
     def start_requests(self):
         """
         Generiert die initialen Anfragen (Requests) für jede zu verarbeitende Datum.
-        Für jedes Datum wird eine Anfrage an die SRF3-Musik-Playlist-Seite gesendet.
-        Playwright wird verwendet, um mit der Webseite zu interagieren (Datum auswählen,
-        auf das Laden der Inhalte warten).
+        Für jedes Datum wird die Song-Log-Schnittstelle per HTTP abgefragt (`api_request`).
+        Ohne `use_api` oder wenn die Schnittstelle fehlschlägt, wird die SRF3-Musik-Playlist-Seite
+        per Playwright geladen (`browser_request`). Daten, die laut StateStore bereits
+        erfolgreich geladen wurden, werden übersprungen.
 
         Parameter:
             Keine.
@@ -84,27 +132,58 @@ class SRF3PlaylistSpider(DownloadSpider):
         """
         for date_obj in self.date_list:
             filename_date_str = date_obj.strftime("%Y-%m-%d")
-            target_date_input_format = date_obj.strftime("%d.%m.%Y")
-
-            playwright_page_methods = [
-                PageMethod("wait_for_selector", "div#song-log", state="visible", timeout=15000),
-                PageMethod("fill", "input#js-date-picker__input-field", target_date_input_format),
-                PageMethod("press", "input#js-date-picker__input-field", "Enter"),
-                PageMethod("wait_for_selector", f"h4.landingpage-heading:has-text('{target_date_input_format}')", state="visible", timeout=20000),
-                PageMethod("wait_for_selector", "ol.songlog__list", state="visible", timeout=15000),
-            ]
-
-            yield scrapy.Request(
-                "https://www.srf.ch/radio-srf-3/gespielte-musik",
-                callback=self.parse,
-                dont_filter=True,
-                meta={
-                    "playwright": True,
-                    "playwright_page_methods": playwright_page_methods,
-                    "filename_date_str": filename_date_str,
-                }
-            )
+            if DAY_SLOT in get_state_store().completed_hours(self.name, filename_date_str):
+                self.logger.info(f"Playlist für {filename_date_str} bereits geladen, überspringe.")
+                continue
+            if self.use_api:
+                yield self.api_request(date_obj)
+            else:
+                yield self.browser_request(date_obj)
+
+    def api_request(self, date_obj: date) -> scrapy.Request:
+        """Anfrage an die Song-Log-Schnittstelle für einen Tag (00:00 bis 24:00 Schweizer Zeit)."""
+        day_start = datetime.combine(date_obj, time(), SRF_ZONE)
+        day_end = datetime.combine(date_obj + timedelta(days=1), time(), SRF_ZONE)
+        params = {
+            "from": day_start.isoformat(),
+            "to": day_end.isoformat(),
+            "pageSize": SONG_LOG_PAGE_SIZE,
+        }
+        url = f"{self.settings.get('SRF3_SONG_LOG_URL', SONG_LOG_URL)}?{urlencode(params)}"
+        return scrapy.Request(
+            url,
+            callback=self.parse_api,
+            errback=self.api_errback,
+            dont_filter=True,
+            meta={"filename_date_str": date_obj.strftime("%Y-%m-%d")},
+        )
 
+    def browser_request(self, date_obj: date) -> scrapy.Request:
+        """Lädt die Seite "Gespielte Musik" per Playwright und wählt das Datum im Datepicker aus."""
+        filename_date_str = date_obj.strftime("%Y-%m-%d")
+        target_date_input_format = date_obj.strftime("%d.%m.%Y")
+
+        playwright_page_methods = [
+            PageMethod("wait_for_selector", "div#song-log", state="visible", timeout=15000),
+            PageMethod("fill", "input#js-date-picker__input-field", target_date_input_format),
+            PageMethod("press", "input#js-date-picker__input-field", "Enter"),
+            PageMethod("wait_for_selector", f"h4.landingpage-heading:has-text('{target_date_input_format}')", state="visible", timeout=20000),
+            PageMethod("wait_for_selector", "ol.songlog__list", state="visible", timeout=15000),
+        ]
+
+        return scrapy.Request(
+            "https://www.srf.ch/radio-srf-3/gespielte-musik",
+            callback=self.parse,
+            errback=self.playlist_errback,
+            dont_filter=True,
+            meta={
+                "playwright": True,
+                "playwright_page_methods": playwright_page_methods,
+                "filename_date_str": filename_date_str,
+            }
+        )
+
+    @timed
     def parse(self, response: HtmlResponse, **kwargs):
         """
         Verarbeitet die Antwort (Response) der Webseite. Speichert zuerst die rohe
@@ -124,26 +203,30 @@ class SRF3PlaylistSpider(DownloadSpider):
         """
         filename_date_str = response.meta.get("filename_date_str")
 
+        # beim Replay landen auch die gespeicherten Antworten der Schnittstelle hier
+        if not isinstance(response, HtmlResponse):
+            yield from self.parse_api(response)
+            return
+
         if DATA_PATH:
             os.makedirs(DATA_PATH, exist_ok=True)
-        super().save_response(response)
+        super().save_response(response, prefix=f"{filename_date_str}_")
 
-        html_filename = f"srf3_{filename_date_str}.html"
-        html_path = os.path.join(DATA_PATH, html_filename)
-    
-        try:
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-        except IOError as e:
-            self.logger.error(f"Could not write HTML to {html_path}: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred while writing HTML to {html_path}: {e}")
+        # beim Replay liegt das HTML bereits als Snapshot vor
+        if not self.replay:
+            html_filename = f"srf3_{filename_date_str}.html"
+            html_path = os.path.join(DATA_PATH, html_filename)
+
+            try:
+                with open(html_path, 'w', encoding='utf-8') as f:
+                    f.write(response.text)
+            except IOError as e:
+                self.logger.error(f"Could not write HTML to {html_path}: {e}")
+            except Exception as e:
+                self.logger.error(f"An unexpected error occurred while writing HTML to {html_path}: {e}")
 
         songs = []
-        for entry in response.css('ol.songlog__list li.songlog__entry'):
-            time_str = entry.css('.songlog__time::text').get()
-            title = entry.css('.songlog__song-title::text').get()
-            artist = entry.css('.songlog__artist::text').get()
+        for time_str, title, artist in SONG_LOG_ROWS.extract(response):
             if time_str and title and artist:
                 songs.append({
                     "time": time_str.strip(),
@@ -152,18 +235,93 @@ class SRF3PlaylistSpider(DownloadSpider):
                 })
 
         self.log(f"Extrahierte {len(songs)} Songs für Datum {filename_date_str}.")
+        yield from self.store_songs(response, songs, filename_date_str)
+
+    @timed
+    def parse_api(self, response: TextResponse):
+        """
+        Verarbeitet eine Seite der Song-Log-Schnittstelle. Die Einträge werden in dasselbe
+        Format wie die Liste auf der Webseite gebracht (Uhrzeit in Schweizer Zeit, Titel,
+        Interpret), sodass die JSON-Datei in `parsed/` identisch aussieht. Weitere Seiten
+        werden über `next` nachgeladen; liefert die Schnittstelle für den Tag nichts, wird
+        die Webseite per Playwright geladen.
+
+        Meta-Parameter (aus `response.meta`):
+            filename_date_str (str): Das Datum (im Format `YYYY-MM-DD`).
+            songs (list, optional): Songs der vorherigen Seiten.
+        """
+        filename_date_str = response.meta.get("filename_date_str")
+        super().save_response(response, prefix=f"{filename_date_str}_")
+
+        songs = list(response.meta.get("songs", []))
+        try:
+            data = json.loads(response.text)
+            for entry in data.get("songList", []):
+                played = datetime.fromisoformat(entry["date"]).astimezone(SRF_ZONE)
+                if played.strftime("%Y-%m-%d") != filename_date_str:
+                    continue
+                title = (entry.get("title") or "").strip()
+                artist = ((entry.get("artist") or {}).get("name") or "").strip()
+                if title and artist:
+                    songs.append({"time": played.strftime("%H:%M"), "title": title, "artist": artist})
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.logger.warning(f"Unerwartete Antwort der Song-Log-Schnittstelle für {filename_date_str}: {e!r}")
+            yield self.browser_request(date.fromisoformat(filename_date_str))
+            return
+
+        if data.get("next"):
+            yield response.follow(
+                data["next"],
+                callback=self.parse_api,
+                errback=self.api_errback,
+                dont_filter=True,
+                meta={"filename_date_str": filename_date_str, "songs": songs},
+            )
+            return
+
+        if not songs:
+            self.logger.warning(f"Song-Log-Schnittstelle liefert keine Songs für {filename_date_str}, lade Webseite.")
+            yield self.browser_request(date.fromisoformat(filename_date_str))
+            return
+
+        self.log(f"Song-Log-Schnittstelle lieferte {len(songs)} Songs für Datum {filename_date_str}.")
+        yield from self.store_songs(response, songs, filename_date_str)
+
+    def api_errback(self, failure):
+        """Die Schnittstelle ist nicht erreichbar oder antwortet mit einem Fehler: Rückfall auf Playwright."""
+        filename_date_str = failure.request.meta.get("filename_date_str")
+        self.logger.warning(f"Song-Log-Schnittstelle für {filename_date_str} fehlgeschlagen ({failure.value}), lade Webseite.")
+        return self.browser_request(date.fromisoformat(filename_date_str))
+
+    def store_songs(self, response: Response, songs: list, filename_date_str: str):
+        """
+        Gibt die Songs eines Tages als `PlaylistItem`s aus (die ParsedOutputPipeline
+        schreibt sie als JSON nach `parsed/`) und markiert den Tages-Slot im StateStore.
+        """
+        filename = f"{SRF3PlaylistSpider.name}_{filename_date_str}.json"
+        for song in songs:
+            try:
+                song_time = datetime.strptime(f"{filename_date_str} {song['time']}", "%Y-%m-%d %H:%M")
+                iso_ts = song_time.replace(tzinfo=ZoneInfo("Europe/Zurich")).isoformat(timespec="minutes")
+            except ValueError:
+                self.logger.warning(f"Ungültige Zeitangabe '{song['time']}' für Datum {filename_date_str}.")
+                continue
+            yield PlaylistItem(datetime=iso_ts, title=song["title"], performer=song["artist"], source=self.name,
+                               parsed_file=filename)
 
         if songs:
-            filename = f"{SRF3PlaylistSpider.name}_{filename_date_str}.json"
-            filepath = os.path.join(DATA_PATH, self.name, 'parsed', filename)
-            try:    
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(songs, f, ensure_ascii=False, indent=4)
-                self.log(f"Song-Daten gespeichert in {filepath}")
-            except IOError as e:
-                self.logger.error(f"Could not write JSON to {filepath}: {e}")
-            except Exception as e:
-                self.logger.error(f"An unexpected error occurred while writing JSON to {filepath}: {e}")
+            self.mark_slot(filename_date_str, DAY_SLOT, SLOT_DONE, bytes=len(response.body), items=len(songs))
         else:
             self.log(f"Keine Songs gefunden für {filename_date_str}.")
+            self.mark_slot(filename_date_str, DAY_SLOT, SLOT_EMPTY, bytes=len(response.body))
+
+    def playlist_errback(self, failure):
+        """
+        Wird aufgerufen, wenn die Playlist eines Datums nicht geladen werden konnte
+        (z.B. Timeout beim Warten auf die Song-Liste). Markiert den Tages-Slot als
+        fehlgeschlagen, damit er beim nächsten Lauf erneut angefragt wird.
+        """
+        filename_date_str = failure.request.meta.get("filename_date_str")
+        self.logger.error(f"Playlist für {filename_date_str} konnte nicht geladen werden: {failure.value}")
+        self.mark_slot(filename_date_str, DAY_SLOT, SLOT_FAILED)
 
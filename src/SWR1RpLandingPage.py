@@ -3,8 +3,10 @@ import DownloadSpider # Importiere die Basisklasse
 import json
 from datetime import datetime
 import os
+from metrics import timed
 from settings import DATA_PATH
 from scrapy_playwright.page import PageMethod
+from playwright_contexts import landing_page_meta, landing_page_settings
 
 class SWR1RpLandingPage(DownloadSpider.DownloadSpider):
     """
@@ -15,6 +17,9 @@ class SWR1RpLandingPage(DownloadSpider.DownloadSpider):
     # run hourly
     interval = 60 * 60
     compress = True
+    deduplicate = True
+
+    custom_settings = landing_page_settings(first_party_domains=("swr.de",))
 
     def start_requests(self):
         """
@@ -25,24 +30,22 @@ class SWR1RpLandingPage(DownloadSpider.DownloadSpider):
 
         yield scrapy.Request(
             "https://www.swr.de/swr1/rp/index.html",
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_selector", selector="button.playerbar-btn-collapse", state="visible"),
-                    PageMethod("click", selector="button.playerbar-btn-collapse"),
-                    PageMethod("wait_for_function",
-                               expression="""
-                                   () => {
-                                       const el = document.querySelector('.container.playerbar-container');
-                                       return el && el.textContent && el.textContent.trim().length > 0;
-                                   }
-                               """,
-                               timeout=2000
-                    ),
-                ]
-            }
+            meta=landing_page_meta([
+                PageMethod("wait_for_selector", selector="button.playerbar-btn-collapse", state="visible"),
+                PageMethod("click", selector="button.playerbar-btn-collapse"),
+                PageMethod("wait_for_function",
+                           expression="""
+                               () => {
+                                   const el = document.querySelector('.container.playerbar-container');
+                                   return el && el.textContent && el.textContent.trim().length > 0;
+                               }
+                           """,
+                           timeout=2000
+                ),
+            ])
         )
 
+    @timed
     def parse(self, response, **kwargs):
         """
         Parst die Antwort der SWR1-RP-Webseite.
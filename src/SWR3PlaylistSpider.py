@@ -2,12 +2,39 @@ import scrapy
 from scrapy.http.response.html import HtmlResponse
 import json
 import os
+import re
 from datetime import datetime, date, timedelta
+from typing import NamedTuple
 from zoneinfo import ZoneInfo
 from urllib.parse import urlencode
 
 from DownloadSpider import DownloadSpider
+from extraction import RowExtractor
+from metrics import timed
 from settings import DATA_PATH
+from items import PlaylistItem
+from state_store import SLOT_DONE, SLOT_EMPTY, SLOT_FAILED, get_state_store
+
+
+class PlaylistRow(NamedTuple):
+    time: str | None
+    title: str | None
+    performer: str | None
+
+
+PLAYLIST_ROWS = RowExtractor(
+    PlaylistRow,
+    rows='ul.list-group.list-playlist li.list-group-item',
+    fields={
+        'time': 'time::attr(datetime)',
+        'title': 'dd.playlist-item-song::text',
+        'performer': 'dd.playlist-item-artist::text',
+    },
+)
+
+# Präfix der gespeicherten Snapshots, z.B. "2025-05-14_13-00_"
+SNAPSHOT_PREFIX = re.compile(r"(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})_")
+
 
 """
 SWR3PlaylistSpider ist ein Scrapy-Spider, der die Playlist-Daten von SWR3 abruft.
@@ -20,10 +47,17 @@ class SWR3PlaylistSpider(DownloadSpider):
     # run daily
     interval = 60 * 60 * 24
     compress = True
+    replay_callback = "parse_playlist_page"
 
     custom_settings = {
-        'DOWNLOAD_DELAY': 5, # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Wenn der Delay zu kurz ist, wird der Aufruf mit einem 500-Fehler abgelehnt!
+        # Start bei 5 Sekunden, AimdThrottle passt Delay und Parallelität anhand der 5xx/429-Antworten an.
+        'DOWNLOAD_DELAY': 5,
         'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'AIMD_THROTTLE_ENABLED': True,
+        'AIMD_THROTTLE_MIN_DELAY': 1,
+        'AIMD_THROTTLE_MAX_DELAY': 60,
+        'AIMD_THROTTLE_MAX_CONCURRENCY': 2,
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
     }
 
@@ -79,13 +113,20 @@ class SWR3PlaylistSpider(DownloadSpider):
 
         self.logger.info(f"SWR3PlaylistSpider initialisiert für Datumsbereich: {self.start_date} bis {self.end_date}")
 
+    def snapshot_meta(self, name: str) -> dict | None:
+        matches = SNAPSHOT_PREFIX.match(name)
+        if not matches:
+            return None
+        return {'playlist_date': matches[1], 'playlist_time': f"{matches[2]}:{matches[3]}"}
+
     def start_requests(self):
         """
         Generiert die initialen Anfragen (Requests) für jede Stunde innerhalb des
         festgelegten Datumsbereichs. Für jedes Datum und jede Stunde wird eine
         Anfrage an die SWR3-Playlist-Seite gesendet. Die Methode berücksichtigt,
         ob das Datum in der Vergangenheit, Gegenwart oder Zukunft liegt, um die
-        relevanten Stunden für den Abruf zu bestimmen.
+        relevanten Stunden für den Abruf zu bestimmen. Stunden, die laut StateStore
+        bereits erfolgreich geladen wurden, werden übersprungen.
 
         Parameter:
             Keine.
@@ -141,6 +182,10 @@ class SWR3PlaylistSpider(DownloadSpider):
                 self.logger.info(f"Verarbeite zukünftiges Datum ({date_value_str_for_request}). "
                                  f"Versuche alle {len(all_possible_time_options)} Zeitoptionen (Daten sind möglicherweise nicht verfügbar).")
             
+            # bereits erfolgreich geladene Stunden nicht erneut anfragen
+            completed_hours = get_state_store().completed_hours(self.name, date_value_str_for_request)
+            time_options_for_this_date = [t for t in time_options_for_this_date if int(t.split(":")[0]) not in completed_hours]
+
             if time_options_for_this_date:
                 self.logger.info(f"Für Datum {date_value_str_for_request}, verarbeite Zeiten: {time_options_for_this_date}")
                 for time_value in time_options_for_this_date:
@@ -155,21 +200,24 @@ class SWR3PlaylistSpider(DownloadSpider):
                     yield scrapy.Request(
                         playlist_url, 
                         callback=self.parse_playlist_page,
+                        errback=self.playlist_errback,
                         headers=headers,
                         meta={'playlist_date': date_value_str_for_request, 'playlist_time': time_value}
                     )
             else:
-                self.logger.info(f"Keine Zeitoptionen für Datum {date_value_str_for_request} zu verarbeiten.")
+                self.logger.info(f"Keine (offenen) Zeitoptionen für Datum {date_value_str_for_request} zu verarbeiten.")
             
             current_processing_date += timedelta(days=1)
 
+    @timed
     def parse_playlist_page(self, response: HtmlResponse):
         """
         Verarbeitet die Antwort (Response) einer Playlist-Seite für eine spezifische Stunde.
         Speichert zuerst die rohe HTML-Antwort. Extrahiert dann Song-Informationen
         (Zeitstempel, Titel, Interpret) aus der HTML-Struktur. Die extrahierten
-        Song-Daten werden in einer JSON-Datei gespeichert, deren Name das Datum
-        und die Stunde der Playlist enthält.
+        Song-Daten werden als `PlaylistItem`s ausgegeben; die ParsedOutputPipeline
+        schreibt sie in eine JSON-Datei, deren Name das Datum und die Stunde der
+        Playlist enthält.
 
         Parameter:
             response (HtmlResponse): Das von Scrapy empfangene Antwortobjekt, das den
@@ -188,14 +236,14 @@ class SWR3PlaylistSpider(DownloadSpider):
         super().save_response(response, prefix=f"{playlist_date}_{playlist_time_for_filename}_")
 
         # Playlist in JSON extraktieren.
-        items = response.css('ul.list-group.list-playlist li.list-group-item')
+        rows = list(PLAYLIST_ROWS.extract(response))
         playlist_data = []
         
-        if not items:
+        if not rows:
             self.logger.warning(f"No playlist items found on {response.url}")
 
-        for item in items:
-            time_attr = item.css('time::attr(datetime)').get()
+        for row in rows:
+            time_attr = row.time
             if not time_attr:
                 self.logger.warning(f"Missing time attribute in item on {response.url}")
                 continue
@@ -209,23 +257,30 @@ class SWR3PlaylistSpider(DownloadSpider):
                 self.logger.error(f"Error parsing datetime string '{time_attr}': {e}. Using raw value.")
                 iso_ts = time_attr
 
-            title = item.css('dd.playlist-item-song::text').get()
-            performer = item.css('dd.playlist-item-artist::text').get()
-
             playlist_data.append({
                 'datetime': iso_ts,
-                'title': title.strip() if title else None,
-                'performer': performer.strip() if performer else None
+                'title': row.title.strip() if row.title else None,
+                'performer': row.performer.strip() if row.performer else None
             })
 
         json_filename = f"{SWR3PlaylistSpider.name}_{playlist_date}_{playlist_time_for_filename}.json"
-        path = os.path.join(DATA_PATH, self.name, 'parsed', json_filename)
-        
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(playlist_data, f, ensure_ascii=False, indent=4)
-            self.logger.info(f"Wrote {len(playlist_data)} entries to {path}")
-        except IOError as e:
-            self.logger.error(f"Could not write JSON to {path}: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred while writing JSON to {path}: {e}")
\ No newline at end of file
+
+        slot_hour = int(response.meta['playlist_time'].split(":")[0])
+        self.mark_slot(playlist_date, slot_hour, SLOT_DONE if playlist_data else SLOT_EMPTY,
+                       bytes=len(response.body), items=len(playlist_data))
+
+        # die JSON-Datei in parsed/ schreibt die ParsedOutputPipeline
+        for entry in playlist_data:
+            yield PlaylistItem(source=self.name, parsed_file=json_filename, **entry)
+
+    def playlist_errback(self, failure):
+        """
+        Wird aufgerufen, wenn der Abruf einer Playlist-Stunde endgültig fehlschlägt
+        (z.B. 500-Fehler nach allen Retries). Markiert den Slot als fehlgeschlagen,
+        damit er beim nächsten Lauf erneut angefragt wird.
+        """
+        request = failure.request
+        playlist_date = request.meta['playlist_date']
+        playlist_time = request.meta['playlist_time']
+        self.logger.error(f"Playlist für {playlist_date} {playlist_time} konnte nicht geladen werden: {failure.value}")
+        self.mark_slot(playlist_date, int(playlist_time.split(":")[0]), SLOT_FAILED)
\ No newline at end of file
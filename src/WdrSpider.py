@@ -4,14 +4,38 @@ import json
 import os
 import mimetypes
 from datetime import datetime, timezone
+from typing import NamedTuple
 
 import DownloadSpider
+from extraction import RowExtractor
+from metrics import timed
 from settings import DATA_PATH
+from items import PlaylistItem
+
+
+class WdrPlaylistRow(NamedTuple):
+    date_time: list
+    title: str | None
+    performer: str | None
+
+
+PLAYLIST_ROWS = RowExtractor(
+    WdrPlaylistRow,
+    rows='#searchPlaylistResult tr.data',
+    fields={
+        'date_time': 'th.entry.datetime::text',
+        'title': 'td.entry.title::text',
+        'performer': 'td.entry.performer::text',
+    },
+    all_fields=('date_time',),
+)
 
 
 class WdrSpider(DownloadSpider.DownloadSpider):
     interval = 60 * 60
     compress = True
+    conditional_get = True
+    deduplicate = True
     
     def parse_wdr_time(self, time_str: str) -> str:
         # Convert the time string to a datetime object
@@ -21,25 +45,24 @@ class WdrSpider(DownloadSpider.DownloadSpider):
         # Format the datetime object as a string in ISO 8601 format
         return dt_utc.isoformat(timespec="seconds")
 
+    @timed
     def parse(self, response: HtmlResponse, **kwargs):
         super().save_response(response)
         
 
-        playlistTable = response.css('#searchPlaylistResult')
         # Extract rows from the playlist table
-        rows = playlistTable.css('tr.data')[1:] # discard the first row, which is a header
+        rows = list(PLAYLIST_ROWS.extract(response))[1:] # discard the first row, which is a header
 
         # Initialize an empty list to store the extracted data
         playlist_data = []
 
         # Iterate over each row and extract the relevant data
         for row in rows:
-            date_time = row.css('th.entry.datetime::text').getall()
-            date_time = ''.join(date_time).strip().replace('\n', '').replace('<br>', ' ')
+            date_time = ''.join(row.date_time).strip().replace('\n', '').replace('<br>', ' ')
             date_time = self.parse_wdr_time(date_time)
 
-            title = row.css('td.entry.title::text').get().strip()
-            performer = row.css('td.entry.performer::text').get().strip()
+            title = row.title.strip()
+            performer = row.performer.strip()
 
             # Append the extracted data as a dictionary
             playlist_data.append({
@@ -47,9 +70,14 @@ class WdrSpider(DownloadSpider.DownloadSpider):
             'title': title,
             'performer': performer
             })
-        json_path = os.path.join(DATA_PATH, self.name, 'parsed', self.generate_name(response) + '.json')
-        with open(json_path, "wb") as f:
-            f.write(json.dumps(playlist_data, indent=4).encode('utf-8'))
+        if playlist_data:
+            # Zeitstempel im gleichen Format, die Spanne stimmt also unabhängig von der Zeitzone
+            times = [datetime.fromisoformat(entry['datetime']) for entry in playlist_data]
+            self.observe_window(min(times), max(times), self.response_time(response))
+
+        json_filename = self.generate_name(response) + '.json'
+        for entry in playlist_data:
+            yield PlaylistItem(source=self.name, parsed_file=json_filename, **entry)
 
 
 class Wdr2Spider(WdrSpider):
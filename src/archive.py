@@ -0,0 +1,104 @@
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from settings import DATA_PATH
+from song_catalog import get_song_catalog
+
+"""
+Spaltenbasiertes Playlist-Archiv: eine Parquet-Datei pro Sender und Monat unter
+`DATA_PATH/archive/<sender>/<YYYY-MM>.parquet`, nach Zeit sortiert und ohne doppelte Zeilen.
+"""
+
+ARCHIVE_DIRECTORY = os.path.join(DATA_PATH, "archive")
+
+SCHEMA = pa.schema([
+    ("datetime", pa.timestamp("s", tz="UTC")),
+    ("title", pa.string()),
+    ("performer", pa.string()),
+    ("source", pa.string()),
+    # ID im Song-Katalog (song_catalog.py), leer bei fehlendem Titel oder Interpret
+    ("song_id", pa.int32()),
+])
+
+# Zeitzone für Zeitstempel ohne Offset, alle Sender außer SRF sitzen in Deutschland
+DEFAULT_ZONE = ZoneInfo("Europe/Berlin")
+
+
+def parse_datetime(value: str) -> datetime:
+    """Wandelt einen ISO-8601-Zeitstempel in eine UTC-Zeit um."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=DEFAULT_ZONE)
+    return dt.astimezone(timezone.utc)
+
+
+def month_key(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+
+def archive_path(station: str, month: str, archive_directory: str = ARCHIVE_DIRECTORY) -> str:
+    return os.path.join(archive_directory, station, f"{month}.parquet")
+
+
+def read_table(path: str) -> pa.Table:
+    """Liest eine Archivdatei; Dateien aus der Zeit vor dem Song-Katalog bekommen eine leere `song_id`-Spalte."""
+    table = pq.read_table(path)
+    if "song_id" not in table.column_names:
+        table = table.append_column("song_id", pa.nulls(table.num_rows, pa.int32()))
+    return table.select(SCHEMA.names).cast(SCHEMA)
+
+
+def read_station_month(station: str, month: str, archive_directory: str = ARCHIVE_DIRECTORY) -> pa.Table:
+    """Lädt einen Sender-Monat mit einem einzigen Dateizugriff. Fehlt der Monat, ist die Tabelle leer."""
+    path = archive_path(station, month, archive_directory)
+    if not os.path.isfile(path):
+        return SCHEMA.empty_table()
+    return read_table(path)
+
+
+def assign_song_ids(table: pa.Table) -> pa.Table:
+    """Trägt für alle Zeilen ohne `song_id` die ID aus dem Song-Katalog ein."""
+    song_ids = table.column("song_id")
+    if song_ids.null_count == 0:
+        return table
+    missing = [i for i, song_id in enumerate(song_ids.to_pylist()) if song_id is None]
+    titles = table.column("title").to_pylist()
+    performers = table.column("performer").to_pylist()
+    ids = song_ids.to_pylist()
+    for i, song_id in zip(missing, get_song_catalog().intern_many((titles[i], performers[i]) for i in missing)):
+        ids[i] = song_id
+    return table.set_column(SCHEMA.get_field_index("song_id"), "song_id", pa.array(ids, pa.int32()))
+
+
+def list_months(station: str, archive_directory: str = ARCHIVE_DIRECTORY) -> list:
+    directory = os.path.join(archive_directory, station)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-len(".parquet")] for f in os.listdir(directory) if f.endswith(".parquet"))
+
+
+def append_rows(station: str, month: str, rows: list, archive_directory: str = ARCHIVE_DIRECTORY):
+    """
+    Fügt `rows` (Dicts mit den Spalten aus `SCHEMA`) dem Sender-Monat hinzu.
+    Die Datei wird komplett neu geschrieben: sortiert nach Zeit, identische Zeilen nur einmal.
+    Fehlende Song-IDs werden dabei aus dem Song-Katalog ergänzt.
+    """
+    path = archive_path(station, month, archive_directory)
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+    if os.path.isfile(path):
+        table = pa.concat_tables([read_table(path), table])
+    table = assign_song_ids(table)
+
+    columns = SCHEMA.names
+    table = table.group_by(columns, use_threads=False).aggregate([]).select(columns)
+    table = table.sort_by([("datetime", "ascending"), ("title", "ascending")])
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
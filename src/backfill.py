@@ -0,0 +1,105 @@
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from time import time
+
+from scrapy.crawler import CrawlerRunner
+from scrapy.settings import Settings
+from scrapy.utils.log import configure_logging
+from scrapy.utils.reactor import install_reactor
+from twisted.internet.defer import DeferredList, DeferredSemaphore
+
+from SRF3PlaylistSpider import SRF3PlaylistSpider
+from SWR1RpPlaylistSpider import SWR1RpPlaylistSpider
+from SWR3PlaylistSpider import SWR3PlaylistSpider
+from settings import SETTINGS
+from state_store import SLOT_DONE, get_state_store
+
+"""
+Backfill für die Playlist-Spider mit Datumsbereich.
+
+Der Bereich wird in Shards von `--shard-days` Tagen aufgeteilt. Shards verschiedener
+Domains laufen parallel, pro Domain höchstens `--per-domain` gleichzeitig, damit die
+Server nicht stärker belastet werden als bei einem normalen Lauf. Erledigte Slots
+stehen im StateStore, ein abgebrochener Backfill setzt beim erneuten Start dort fort.
+
+Beispiel:
+    python src/backfill.py swr3_playlist srf3_playlist --start 2025-05-01 --end 2025-05-28
+"""
+
+BACKFILL_SPIDERS = {
+    SWR3PlaylistSpider.name: (SWR3PlaylistSpider, "swr3.de"),
+    SWR1RpPlaylistSpider.name: (SWR1RpPlaylistSpider, "swr.de"),
+    SRF3PlaylistSpider.name: (SRF3PlaylistSpider, "srf.ch"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def split_into_shards(start: date, end: date, shard_days: int) -> list:
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(end, shard_start + timedelta(days=shard_days - 1))
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return shards
+
+
+def count_done_slots(spider_names: list, start: date, end: date) -> int:
+    state_store = get_state_store()
+    first, last = start.isoformat(), end.isoformat()
+    return sum(
+        1
+        for name in spider_names
+        for slot_date, _, _, _, _ in state_store.slots(name, status=SLOT_DONE)
+        if first <= slot_date <= last
+    )
+
+
+def run_backfill(spider_names: list, start: date, end: date, shard_days: int = 7, per_domain: int = 1):
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from twisted.internet import reactor
+
+    configure_logging(Settings(SETTINGS))
+    runner = CrawlerRunner(SETTINGS)
+    semaphores = {}
+    deferreds = []
+    shards = split_into_shards(start, end, shard_days)
+
+    for name in spider_names:
+        spider, domain = BACKFILL_SPIDERS[name]
+        semaphore = semaphores.setdefault(domain, DeferredSemaphore(per_domain))
+        for shard_start, shard_end in shards:
+            logger.info(f"Queueing {name} shard {shard_start} - {shard_end}")
+            deferreds.append(semaphore.run(
+                runner.crawl, spider,
+                start_date_param=shard_start.isoformat(),
+                end_date_param=shard_end.isoformat(),
+            ))
+
+    done_before = count_done_slots(spider_names, start, end)
+    started = time()
+    DeferredList(deferreds).addBoth(lambda _: reactor.stop())
+    reactor.run()
+
+    minutes = (time() - started) / 60
+    done_now = count_done_slots(spider_names, start, end)
+    print(f"Backfill finished: {done_now - done_before} new slots in {minutes:.1f} min "
+          f"({(done_now - done_before) / max(minutes, 1e-6):.1f} slots/min), {done_now} slots done in range.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Holt Playlist-Daten für einen Datumsbereich nach (fortsetzbar).")
+    parser.add_argument("spiders", nargs="+", choices=sorted(BACKFILL_SPIDERS), help="Spider, die nachgeladen werden sollen.")
+    parser.add_argument("--start", required=True, help="Startdatum YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="Enddatum YYYY-MM-DD (Standard: gestern)")
+    parser.add_argument("--shard-days", type=int, default=7, help="Tage pro Shard")
+    parser.add_argument("--per-domain", type=int, default=1, help="Maximal gleichzeitige Shards pro Domain")
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else date.today() - timedelta(days=1)
+    if end_date < start_date:
+        parser.error("--end darf nicht vor --start liegen")
+    run_backfill(args.spiders, start_date, end_date, shard_days=args.shard_days, per_domain=args.per_domain)
@@ -0,0 +1,262 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+from statistics import median
+from time import perf_counter
+
+from scrapy.utils.spider import iterate_spider_output
+
+from reparse import Snapshot, build_response, get_replay_spider
+from settings import DATA_PATH
+
+"""
+Benchmark der Parser aller Spider.
+
+Für jeden Spider werden Seiten in drei Größen (klein, typisch, übergroß) erzeugt und durch
+denselben Callback geschickt wie beim Crawlen bzw. in `reparse.py`. Gemessen werden Median und
+Bestwert der Parse-Zeit, der Spitzen-Speicherverbrauch (tracemalloc) und die Zeilen pro Sekunde.
+Die Ergebnisse werden mit `benchmark_baseline.json` verglichen; ist ein Fall um mehr als
+`--tolerance` langsamer oder speicherhungriger, endet der Lauf mit Exit-Code 1.
+
+Beispiel:
+    python src/benchmark.py                     # gegen die Baseline prüfen
+    python src/benchmark.py DLFNova --rounds 50
+    python src/benchmark.py --update-baseline   # Baseline nach gewollten Änderungen neu schreiben
+"""
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+# Zeitpunkt des Abrufs, den die erzeugten Snapshots tragen
+SNAPSHOT_TIME = "2025-05-15T01:00:00+00:00"
+
+# Seitenrahmen (Navigation, Teaser), damit die Selektoren nicht nur über die Playlist laufen
+PAGE_CHROME = "".join(
+    f'<div class="teaser"><a href="/artikel/{i}.html"><span class="teaser__label">Rubrik {i}</span></a></div>'
+    for i in range(200)
+)
+
+
+def html_page(content: str) -> bytes:
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Playlist</title></head>'
+        f'<body><nav>{PAGE_CHROME}</nav><main>{content}</main><footer>{PAGE_CHROME}</footer></body></html>'
+    ).encode("utf-8")
+
+
+def swr_playlist(rows: int) -> bytes:
+    return html_page('<ul class="list-group list-playlist">' + "".join(
+        f'<li class="list-group-item"><dl><dt><time datetime="2025-05-14T13:{i % 60:02d}:00+02:00">13:{i % 60:02d}</time></dt>'
+        f'<dd class="playlist-item-song">Titel Nummer {i}</dd><dd class="playlist-item-artist">Interpret {i} &amp; Band</dd></dl></li>'
+        for i in range(rows)
+    ) + '</ul>')
+
+
+def srf3_playlist(rows: int) -> bytes:
+    return html_page('<div id="song-log"><ol class="songlog__list">' + "".join(
+        f'<li class="songlog__entry"><span class="songlog__time">{i // 60 % 24:02d}:{i % 60:02d}</span>'
+        f'<span class="songlog__song-title">Titel Nummer {i}</span><span class="songlog__artist">Interpret {i}</span></li>'
+        for i in range(rows)
+    ) + '</ol></div>')
+
+
+def wdr_playlist(rows: int) -> bytes:
+    return html_page('<table id="searchPlaylistResult"><tr class="data"><th>Datum</th><th>Titel</th><th>Interpret</th></tr>' + "".join(
+        f'<tr class="data"><th class="entry datetime">14.05.2025,<br>{i // 60 % 24:02d}.{i % 60:02d} Uhr</th>'
+        f'<td class="entry title">Titel Nummer {i}</td><td class="entry performer">Interpret {i}</td></tr>'
+        for i in range(rows)
+    ) + '</table>')
+
+
+def dlf_playlist(rows: int) -> bytes:
+    return html_page('<ul class="playlist day1">' + "".join(
+        f'<li class="item"><figure><img src="/cover/{i}.jpg"><figcaption><small>14. Mai | {i // 60 % 24:02d}:{i % 60:02d}</small>'
+        f'<h3><div class="title">Titel Nummer {i}</div><div class="artist">Interpret {i}</div></h3></figcaption></figure></li>'
+        for i in range(rows)
+    ) + '</ul>')
+
+
+def nrw_playlist(rows: int) -> bytes:
+    return json.dumps([
+        {"timeslot_iso": f"2025-05-14T{i // 60 % 24:02d}:{i % 60:02d}:00+02:00", "title": f"Titel Nummer {i}",
+         "artist": f"Interpret {i}", "station_id": 28, "cover": f"https://example.org/cover/{i}.jpg"}
+        for i in range(rows)
+    ]).encode("utf-8")
+
+
+def charts(rows: int) -> bytes:
+    return html_page(
+        '<span class="ch-header">Charts vom <strong>09.05.2025</strong> - <strong>15.05.2025</strong></span>'
+        '<table class="chart-table">' + "".join(
+            f'<tr><td class="ch-pos"><span class="this-week">{i + 1}</span></td><td class="ch-trend"><span class="last-week">{i + 2}</span></td>'
+            f'<td class="ch-info"><span class="info-artist">Interpret {i}</span><span class="info-title">Titel Nummer {i}</span></td></tr>'
+            for i in range(rows)
+        ) + '</table>')
+
+
+def landing_page(presenter_markup: str, headline_markup: str):
+    def build(rows: int) -> bytes:
+        return html_page(presenter_markup + "".join(headline_markup.format(i=i) for i in range(rows)))
+    return build
+
+
+# Spider -> (Dateiname des Snapshots, Seitengenerator, typische Zeilenzahl)
+FIXTURES = {
+    "swr3_playlist": ("2025-05-14_13-00_swr3_playlist_{time}.html", swr_playlist, 15),
+    "swr1_rp_playlist": ("2025-05-14_13-00_swr1_rp_playlist_{time}.html", swr_playlist, 15),
+    "srf3_playlist": ("2025-05-14_srf3_playlist_{time}.html", srf3_playlist, 350),
+    "1live": ("1live_{time}.html", wdr_playlist, 60),
+    "wdr2": ("wdr2_{time}.html", wdr_playlist, 60),
+    "DLFNova": ("DLFNova_{time}.html", dlf_playlist, 120),
+    "NRWLokalradios": ("NRWLokalradios_{time}.json", nrw_playlist, 350),
+    "OffizielleCharts": ("OffizielleCharts_{time}.html", charts, 100),
+    "swr3_landing_page": ("swr3_landing_page_{time}.html", landing_page(
+        '<div id="currentshow"><div class="presenter"><a href="/team">Moderatorin</a></div></div>',
+        '<h2 class="hgroup"><span class="headline">Schlagzeile {i}</span></h2>'), 20),
+    "swr1_rp_landing_page": ("swr1_rp_landing_page_{time}.html", landing_page(
+        '<div class="onair-episode-info-host"><span class="onair-episode-info-presenter"><a href="/team">Moderator</a></span></div>',
+        '<span class="headline">Schlagzeile {i}</span>'), 20),
+    "srf3_landing_page": ("srf3_landing_page_{time}.html", landing_page(
+        '<div class="radio-content-header__slot--third"><span class="radio-content-header-teaser__title">Moderator</span></div>',
+        '<span class="teaser__title">Schlagzeile {i}</span>'), 20),
+}
+
+# kleinere Zeitunterschiede sind Messrauschen und zählen nicht als Regression
+MIN_TIME_DELTA = 0.005
+
+# Zeilen pro Größe, bezogen auf die typische Zeilenzahl eines Spiders
+SIZES = {
+    "small": lambda typical: 1,
+    "typical": lambda typical: typical,
+    "oversized": lambda typical: typical * 20,
+}
+
+
+@contextlib.contextmanager
+def redirect_data_path(directory: str):
+    """
+    Die Spider-Module binden `DATA_PATH` beim Import; für den Benchmark schreiben sie
+    ihre JSON-Dateien stattdessen in ein temporäres Verzeichnis.
+    """
+    modules = [m for m in list(sys.modules.values()) if getattr(m, "DATA_PATH", None) == DATA_PATH]
+    for module in modules:
+        module.DATA_PATH = directory
+    try:
+        yield
+    finally:
+        for module in modules:
+            module.DATA_PATH = DATA_PATH
+
+
+def run_case(spider_name: str, rows: int, rounds: int) -> dict:
+    name_template, generate, _ = FIXTURES[spider_name]
+    spider = get_replay_spider(spider_name)
+    body = generate(rows)
+    snapshot = Snapshot(spider_name, name_template.format(time=SNAPSHOT_TIME), SNAPSHOT_TIME, path=spider_name)
+    meta = spider.snapshot_meta(snapshot.name)
+    callback = getattr(spider, spider.replay_callback)
+
+    def parse_once():
+        # Response jedes Mal neu bauen, sonst wäre der geparste Baum aus der ersten Runde gecacht
+        response = build_response(snapshot, body, meta)
+        return list(iterate_spider_output(callback(response)))
+
+    parse_once()  # Aufwärmen: Imports, kompilierte Selektoren
+    times = []
+    for _ in range(rounds):
+        started = perf_counter()
+        parse_once()
+        times.append(perf_counter() - started)
+
+    tracemalloc.start()
+    parse_once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    parse_time = median(times)
+    return {
+        "rows": rows,
+        "bytes": len(body),
+        "median_s": round(parse_time, 6),
+        # schnellste Runde, schwankt deutlich weniger als der Median und dient dem Vergleich
+        "best_s": round(min(times), 6),
+        "peak_kib": round(peak / 1024, 1),
+        "rows_per_s": round(rows / parse_time, 1) if parse_time > 0 else None,
+    }
+
+
+def run_benchmarks(spider_names: list, rounds: int) -> dict:
+    results = {}
+    # Spider-Module vorher laden, damit redirect_data_path auch ihr DATA_PATH umbiegt
+    for spider_name in spider_names:
+        get_replay_spider(spider_name)
+    with tempfile.TemporaryDirectory() as directory, redirect_data_path(directory), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for spider_name in spider_names:
+            typical = FIXTURES[spider_name][2]
+            for size, rows_for in SIZES.items():
+                rows = rows_for(typical)
+                # übergroße Seiten dauern entsprechend länger, dafür weniger Runden
+                case_rounds = max(5, rounds // 4) if size == "oversized" else rounds
+                results[f"{spider_name}/{size}"] = run_case(spider_name, rows, case_rounds)
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case)
+        if expected is None:
+            continue
+        for key in ("best_s", "peak_kib"):
+            if result[key] <= expected[key] * (1 + tolerance):
+                continue
+            if key == "best_s" and result[key] - expected[key] < MIN_TIME_DELTA:
+                continue
+            regressions.append(f"{case}: {key} {result[key]} > {expected[key]} (+{tolerance:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse-Zeit und Speicherverbrauch der Spider messen.")
+    parser.add_argument("spiders", nargs="*", default=list(FIXTURES), help="Namen der Spider (Standard: alle)")
+    parser.add_argument("--rounds", type=int, default=20, help="Messrunden pro Fall")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="erlaubte Verschlechterung gegenüber der Baseline (0.5 = 50 %%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Pfad der Baseline-Datei")
+    parser.add_argument("--update-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern")
+    args = parser.parse_args()
+
+    unknown = set(args.spiders) - set(FIXTURES)
+    if unknown:
+        parser.error(f"no fixtures for {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmarks(args.spiders, args.rounds)
+
+    print(f"{'case':<32} {'rows':>6} {'bytes':>9} {'median ms':>10} {'peak KiB':>10} {'rows/s':>10}")
+    for case, result in results.items():
+        print(f"{case:<32} {result['rows']:>6} {result['bytes']:>9} {result['median_s'] * 1000:>10.2f} "
+              f"{result['peak_kib']:>10.1f} {result['rows_per_s'] or 0:>10.0f}")
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,107 @@
+import logging
+from time import time
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+
+logger = logging.getLogger(__name__)
+
+
+class AimdThrottle:
+    """
+    AIMD-Drosselung (additive increase, multiplicative decrease) pro Download-Slot.
+
+    Antwortet ein Server mit 429 oder 5xx, wird der Delay des Slots vervielfacht und
+    die Parallelität halbiert. Nach `AIMD_THROTTLE_INCREASE_EVERY` erfolgreichen
+    Antworten unterhalb von `AIMD_THROTTLE_TARGET_LATENCY` wird zuerst der Delay
+    schrittweise bis `AIMD_THROTTLE_MIN_DELAY` gesenkt und danach die Parallelität
+    bis `AIMD_THROTTLE_MAX_CONCURRENCY` erhöht. Scrapy startet bei gesetztem Delay
+    nur eine Anfrage pro Delay-Intervall, mehr Parallelität lohnt sich also erst,
+    wenn der Delay am Boden ist.
+
+    Startwerte sind `DOWNLOAD_DELAY` und `CONCURRENT_REQUESTS_PER_DOMAIN`.
+    """
+
+    def __init__(self, crawler: Crawler):
+        settings = crawler.settings
+        if not settings.getbool("AIMD_THROTTLE_ENABLED"):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.debug = settings.getbool("AIMD_THROTTLE_DEBUG")
+        self.min_delay = settings.getfloat("AIMD_THROTTLE_MIN_DELAY", 0.0)
+        self.max_delay = settings.getfloat("AIMD_THROTTLE_MAX_DELAY", 60.0)
+        self.delay_step = settings.getfloat("AIMD_THROTTLE_DELAY_STEP", 0.5)
+        self.backoff_factor = settings.getfloat("AIMD_THROTTLE_BACKOFF_FACTOR", 2.0)
+        self.backoff_delay = settings.getfloat("AIMD_THROTTLE_BACKOFF_DELAY", 1.0)
+        self.min_concurrency = settings.getint("AIMD_THROTTLE_MIN_CONCURRENCY", 1)
+        self.max_concurrency = settings.getint("AIMD_THROTTLE_MAX_CONCURRENCY", 4)
+        self.target_latency = settings.getfloat("AIMD_THROTTLE_TARGET_LATENCY", 2.0)
+        self.increase_every = settings.getint("AIMD_THROTTLE_INCREASE_EVERY", 3)
+        self.throttled_codes = set(settings.getlist("AIMD_THROTTLE_HTTP_CODES", [429, 500, 502, 503, 504]))
+
+        if self.min_delay > self.max_delay or self.min_concurrency > self.max_concurrency:
+            raise NotConfigured("AIMD_THROTTLE floors must not be above the ceilings")
+
+        self.successes = {}
+        self.last_decrease = {}
+        crawler.signals.connect(self._response_downloaded, signal=signals.response_downloaded)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    def _get_slot(self, request: Request):
+        key = request.meta.get("download_slot")
+        if key is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def _response_downloaded(self, response: Response, request: Request, spider: Spider):
+        key, slot = self._get_slot(request)
+        if slot is None:
+            return
+
+        old_delay, old_concurrency = slot.delay, slot.concurrency
+        latency = request.meta.get("download_latency")
+        if int(response.status) in self.throttled_codes:
+            # Anfragen, die schon vor dem letzten Backoff unterwegs waren, lösen keinen weiteren aus
+            sent_at = time() - (latency or 0)
+            if sent_at >= self.last_decrease.get(key, 0):
+                self._decrease(key, slot, response)
+                self.crawler.stats.inc_value("aimd_throttle/decrease_count", spider=spider)
+        else:
+            if latency is not None and latency <= self.target_latency:
+                self._increase(key, slot)
+
+        if self.debug and (slot.delay, slot.concurrency) != (old_delay, old_concurrency):
+            logger.info(
+                f"slot: {key} | status: {response.status} | delay: {old_delay:.2f}s -> {slot.delay:.2f}s | "
+                f"concurrency: {old_concurrency} -> {slot.concurrency}",
+                extra={"spider": spider},
+            )
+
+    def _decrease(self, key: str, slot, response: Response):
+        self.successes[key] = 0
+        self.last_decrease[key] = time()
+        new_delay = max(slot.delay * self.backoff_factor, self.backoff_delay, self.min_delay)
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                new_delay = max(new_delay, float(retry_after))
+            except ValueError:
+                pass  # HTTP-Datum statt Sekunden, dann gilt der normale Backoff
+        slot.delay = min(new_delay, self.max_delay)
+        slot.concurrency = max(self.min_concurrency, slot.concurrency // 2)
+
+    def _increase(self, key: str, slot):
+        self.successes[key] = self.successes.get(key, 0) + 1
+        if self.successes[key] < self.increase_every:
+            return
+        self.successes[key] = 0
+        if slot.delay > self.min_delay:
+            slot.delay = max(self.min_delay, slot.delay - self.delay_step)
+        elif slot.concurrency < self.max_concurrency:
+            slot.concurrency += 1
@@ -0,0 +1,99 @@
+import logging
+import os
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from twisted.internet import task
+
+from metrics import REGISTRY, write_textfile
+from settings import DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+# Metrik -> Stat von scrapy-playwright
+PLAYWRIGHT_STATS = {
+    "playwright_browsers_total": "playwright/browser_count",
+    "playwright_pages_total": "playwright/page_count",
+    "playwright_aborted_requests_total": "playwright/request_count/aborted",
+}
+
+
+class MetricsExporter:
+    """
+    Sammelt pro Spider Download-Latenzen (nach Handler: `playwright` oder `http`), geladene
+    Bytes, HTTP-Status, erzeugte Items und Retries in `metrics.REGISTRY` und schreibt sie als
+    `radio_scraper_<spider>.prom` nach `METRICS_TEXTFILE_DIRECTORY`, wo der Textfile-Collector
+    des node-exporters sie abholt. Geschrieben wird alle `METRICS_INTERVAL` Sekunden und nach dem
+    Ende des Laufs; die Laufzeiten der Parse- und Schreibpfade kommen von `@timed`. Für
+    Playwright-Spider kommen gestartete Browser, Seiten und abgebrochene Anfragen aus den
+    Stats von scrapy-playwright dazu; zusammen mit Latenz und Bytes nach `handler="playwright"`
+    zeigt das, was ein gemeinsamer Browser pro Lauf spart.
+
+    Abschalten mit `METRICS_ENABLED = False`.
+    """
+
+    def __init__(self, crawler: Crawler):
+        settings = crawler.settings
+        if not settings.getbool("METRICS_ENABLED", True):
+            raise NotConfigured
+
+        self.crawler = crawler
+        self.directory = settings.get("METRICS_TEXTFILE_DIRECTORY", os.path.join(DATA_PATH, "metrics"))
+        self.interval = settings.getfloat("METRICS_INTERVAL", 60.0)
+        self.spider = None
+        self.task = None
+
+        crawler.signals.connect(self._spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self._response_received, signal=signals.response_received)
+        crawler.signals.connect(self._item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(self._spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self._engine_stopped, signal=signals.engine_stopped)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    def textfile_path(self, spider: Spider) -> str:
+        return os.path.join(self.directory, f"radio_scraper_{spider.name}.prom")
+
+    def write(self, spider: Spider):
+        try:
+            write_textfile(self.textfile_path(spider), REGISTRY.render(spider=spider.name))
+        except OSError as e:
+            logger.warning(f"Could not write metrics for {spider.name}: {e}")
+
+    def _spider_opened(self, spider: Spider):
+        self.spider = spider
+        if self.interval > 0:
+            self.task = task.LoopingCall(self.write, spider)
+            self.task.start(self.interval, now=False)
+
+    def _response_received(self, response: Response, request: Request, spider: Spider):
+        handler = "playwright" if request.meta.get("playwright") else "http"
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            REGISTRY.observe("download_duration_seconds", latency, spider=spider.name, handler=handler)
+        REGISTRY.inc("downloaded_bytes_total", len(response.body), spider=spider.name, handler=handler)
+        REGISTRY.inc("responses_total", spider=spider.name, status=response.status)
+
+    def _item_scraped(self, item, response: Response, spider: Spider):
+        REGISTRY.inc("items_total", spider=spider.name, item=type(item).__name__)
+
+    def _spider_closed(self, spider: Spider, reason: str):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        retries = self.crawler.stats.get_value("retry/count", 0, spider=spider)
+        if retries:
+            REGISTRY.inc("retries_total", retries, spider=spider.name)
+        REGISTRY.inc("runs_total", spider=spider.name, reason=reason)
+        for metric, stat in PLAYWRIGHT_STATS.items():
+            value = self.crawler.stats.get_value(stat, 0, spider=spider)
+            if value:
+                REGISTRY.inc(metric, value, spider=spider.name)
+
+    def _engine_stopped(self):
+        # erst hier sind auch die Snapshots im Writer-Thread des Spiders geschrieben
+        if self.spider is not None:
+            self.write(self.spider)
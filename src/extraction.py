@@ -0,0 +1,69 @@
+import json
+import re
+from typing import Iterator, NamedTuple, Type
+
+from lxml import etree
+from parsel.csstranslator import css2xpath
+from scrapy.http import TextResponse
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+DECODER = json.JSONDecoder()
+
+
+class RowExtractor:
+    """
+    Extrahiert Tabellen- bzw. Listenzeilen aus einer HTML-Antwort in einem Durchgang.
+
+    Zeilen- und Feld-Selektoren werden einmal beim Erzeugen von CSS nach XPath übersetzt
+    und kompiliert, statt bei jedem `response.css(...)`-Aufruf neu. Pro Zeile werden alle
+    Felder direkt auf dem lxml-Element ausgewertet und als `row_type` (NamedTuple)
+    zurückgegeben. Felder in `all_fields` liefern eine Liste aller Treffer, alle anderen
+    den ersten Treffer oder `None`.
+    """
+
+    def __init__(self, row_type: Type[NamedTuple], rows: str, fields: dict, all_fields: tuple = ()):
+        missing = set(row_type._fields) - set(fields)
+        if missing:
+            raise ValueError(f"No selector for fields {sorted(missing)} of {row_type.__name__}")
+        self.row_type = row_type
+        self.rows = etree.XPath(css2xpath(rows))
+        self.fields = [
+            (etree.XPath(css2xpath(fields[name])), name in all_fields)
+            for name in row_type._fields
+        ]
+
+    def extract(self, response: TextResponse) -> Iterator[NamedTuple]:
+        for row in self.rows(response.selector.root):
+            values = []
+            for xpath, many in self.fields:
+                result = xpath(row)
+                if many:
+                    values.append([str(r) for r in result])
+                else:
+                    values.append(str(result[0]) if result else None)
+            yield self.row_type._make(values)
+
+
+def iter_json_array(text: str) -> Iterator:
+    """
+    Dekodiert ein JSON-Array Element für Element, statt mit `json.loads` die ganze Liste
+    auf einmal aufzubauen. Kein echtes Streaming: `text` liegt vollständig im Speicher,
+    gespart wird nur die Liste der dekodierten Objekte. Ein kaputtes Element bricht erst
+    ab, wenn es erreicht ist; die Elemente davor sind dann schon geliefert.
+    """
+    position = WHITESPACE.match(text, 0).end()
+    if text[position:position + 1] != "[":
+        raise ValueError(f"Expected a JSON array at position {position}")
+    position = WHITESPACE.match(text, position + 1).end()
+    if text[position:position + 1] == "]":
+        return
+    while True:
+        value, position = DECODER.raw_decode(text, position)
+        yield value
+        position = WHITESPACE.match(text, position).end()
+        separator = text[position:position + 1]
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' at position {position}")
+        position = WHITESPACE.match(text, position + 1).end()
@@ -0,0 +1,84 @@
+import asyncio
+from importlib.metadata import PackageNotFoundError, version
+
+from scrapy import Spider
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.crawler import Crawler
+from scrapy.http import Request, Response
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from twisted.internet.defer import Deferred, DeferredList
+
+# Version, gegen die der Start über `_launch()` geprüft ist (siehe requirements.txt)
+SUPPORTED_PLAYWRIGHT_VERSION = "0.0.43"
+
+
+class LazyPlaywrightDownloadHandler:
+    """
+    Download-Handler, der Anfragen je nach `meta["playwright"]` verteilt.
+
+    Normale Anfragen gehen direkt an Scrapys HTTP/1.1-Downloader. Der
+    `ScrapyPlaywrightDownloadHandler` (und damit Playwright und Chromium) wird erst
+    erzeugt, wenn die erste Anfrage mit `meta["playwright"]` ankommt. Ein Lauf ohne
+    Playwright-Spider startet so nie einen Browser.
+    """
+    lazy = False
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+        self.http_handler = HTTP11DownloadHandler.from_crawler(crawler)
+        self.playwright_handler = None
+        self.playwright_launch_lock = asyncio.Lock()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    def download_request(self, request: Request, spider: Spider) -> Deferred:
+        if request.meta.get("playwright"):
+            return deferred_from_coro(self._download_with_playwright(request, spider))
+        return self.http_handler.download_request(request, spider)
+
+    async def _download_with_playwright(self, request: Request, spider: Spider) -> Response:
+        handler = await self._get_playwright_handler()
+        return await maybe_deferred_to_future(handler.download_request(request, spider))
+
+    async def _get_playwright_handler(self):
+        async with self.playwright_launch_lock:
+            if self.playwright_handler is None:
+                # Import erst hier, damit reine HTTP-Läufe scrapy_playwright nie laden
+                from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+                handler = ScrapyPlaywrightDownloadHandler.from_crawler(self.crawler)
+                # Der Handler startet Playwright normalerweise über das Signal engine_started.
+                # Das ist zu diesem Zeitpunkt schon gesendet, daher hier manuell starten. Einen
+                # öffentlichen Weg dafür gibt es nicht, `_launch()` ist privat.
+                await launch_playwright_handler(handler)
+                self.playwright_handler = handler
+                self.crawler.stats.inc_value("playwright/lazy_launch_count")
+        return self.playwright_handler
+
+    def close(self) -> Deferred:
+        deferreds = [self.http_handler.close()]
+        if self.playwright_handler is not None:
+            deferreds.append(self.playwright_handler.close())
+        return DeferredList(deferreds)
+
+
+async def launch_playwright_handler(handler):
+    """
+    Startet Playwright im `ScrapyPlaywrightDownloadHandler` über dessen private Methode
+    `_launch()`. Fehlt sie, bricht der Download mit einer klaren Meldung ab statt mit einem
+    `AttributeError` irgendwo im Handler.
+    """
+    launch = getattr(handler, "_launch", None)
+    if not callable(launch):
+        try:
+            installed = version("scrapy-playwright")
+        except PackageNotFoundError:
+            installed = "unknown"
+        raise RuntimeError(
+            f"scrapy-playwright {installed} has no ScrapyPlaywrightDownloadHandler._launch(); "
+            f"LazyPlaywrightDownloadHandler requires scrapy-playwright=={SUPPORTED_PLAYWRIGHT_VERSION} "
+            f"(pinned in requirements.txt)"
+        )
+    await launch()
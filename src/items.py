@@ -0,0 +1,29 @@
+import scrapy
+
+
+class PlaylistItem(scrapy.Item):
+    """Ein gespielter Titel, gemeinsames Schema aller Playlist-Spider."""
+    # Felder, die die ParsedOutputPipeline in die JSON-Datei unter parsed/ schreibt
+    parsed_fields = ("datetime", "title", "performer")
+
+    # ISO-8601-Zeitstempel mit Zeitzone
+    datetime = scrapy.Field()
+    title = scrapy.Field()
+    performer = scrapy.Field()
+    # Sender bzw. Spider-Name, unter dem der Eintrag archiviert wird
+    source = scrapy.Field()
+    # Dateiname in DATA_PATH/<spider>/parsed/, in den der Eintrag geschrieben wird
+    parsed_file = scrapy.Field()
+
+
+class ChartEntry(scrapy.Item):
+    """Eine Platzierung der Offiziellen Deutschen Charts."""
+    parsed_fields = ("datetime_from", "datetime_to", "position", "position_old", "perfomer", "title")
+
+    datetime_from = scrapy.Field()
+    datetime_to = scrapy.Field()
+    position = scrapy.Field()
+    position_old = scrapy.Field()
+    perfomer = scrapy.Field()
+    title = scrapy.Field()
+    parsed_file = scrapy.Field()
@@ -1,86 +1,168 @@
-import json
-from datetime import date, datetime, timezone, timedelta
-import SRF3PlaylistSpider
-import SWR1RpPlaylistSpider
-import SWR3PlaylistSpider
-import SWR1RpLandingPage
-import SWR3LandingPage
-import SRF3LandingPage
-import WdrSpider
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.reactor import install_reactor
-from OffizielleChartsSpider import OffizielleChartsSpider
-from DLFNovaSpider import DLFNovaSpider
-from NRWLokalradiosSpider import NRWLokalradiosSpider
+import argparse
+import multiprocessing
+import os
+from datetime import datetime, timezone, timedelta
+from multiprocessing.connection import wait
+from time import time
+from registry import BROWSER, GROUP_TIMEOUTS, SPIDERS, adaptive_run_time, get_spec
 from settings import SETTINGS
-import os.path
+from state_store import RUN_CRASHED, RUN_TIMEOUT, get_state_store
 
+# für Gruppen ohne eigenen Eintrag in GROUP_TIMEOUTS
+DEFAULT_GROUP_TIMEOUT = 30 * 60
 
-def run():
-    update_last_runs_list = []
+
+def run(isolate: bool = True, browser_port: int | None = None):
     last_run_list = get_last_runs()
 
+    # Nur fällige Spider werden importiert, siehe registry.py
+    due_spiders = []
+    for spec in SPIDERS:
+        if spider_is_due(spec, last_run_list):
+            due_spiders.append(spec)
+        else:
+            print(f"Skipping spider {spec.name}, interval not reached.")
+
+    if not due_spiders:
+        return
+
+    started = time()
+    if isolate:
+        run_groups(due_spiders, browser_port)
+    else:
+        run_spiders([spec.name for spec in due_spiders], browser_port)
+    print(f"Run finished after {time() - started:.1f}s.")
+
+
+def run_spiders(names: list, browser_port: int | None = None):
+    """
+    Startet die Spider `names` gemeinsam in einem `CrawlerProcess` und wartet auf alle.
+    Sind mehrere Browser-Spider dabei und ist `browser_port` gesetzt, verbinden sie sich per
+    CDP mit einem gemeinsamen Chromium, statt dass jeder Crawler einen eigenen startet.
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.reactor import install_reactor
+
     install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
     process = CrawlerProcess(SETTINGS)
-    
-    # Set the start and end dates for the playlist retrieval
-    # TODO: Download once a day, for the previous day. eg. cron every day at 01:00
-    start_date = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
-    end_date = start_date
-    # process.crawl(SWR1RpPlaylistSpider.SWR1RpPlaylistSpider, start_date_param=start_date, end_date_param=end_date)
-    #process.crawl(SWR3PlaylistSpider.SWR3PlaylistSpider, start_date_param=start_date, end_date_param=end_date)
-    #process.crawl(SRF3PlaylistSpider.SRF3PlaylistSpider, start_date_param=start_date, end_date_param=end_date)
-
-    spiders_to_run = []
-    spiders_to_run.append({'spider': SWR1RpPlaylistSpider.SWR1RpPlaylistSpider, 'args': {'start_date_param': start_date, 'end_date_param': end_date}})
-    spiders_to_run.append({'spider': SWR3PlaylistSpider.SWR3PlaylistSpider, 'args': {'start_date_param': start_date, 'end_date_param': end_date}})
-    spiders_to_run.append({'spider': SRF3PlaylistSpider.SRF3PlaylistSpider, 'args': {'start_date_param': start_date, 'end_date_param': end_date}})
-    spiders_to_run.append({'spider': SWR1RpLandingPage.SWR1RpLandingPage, 'args': {}})
-    spiders_to_run.append({'spider': SWR3LandingPage.SWR3LandingPage, 'args': {}})
-    spiders_to_run.append({'spider': SRF3LandingPage.SRF3LandingPage, 'args': {}})
-    spiders_to_run.append({'spider': OffizielleChartsSpider, 'args': {}})
-    spiders_to_run.append({'spider': DLFNovaSpider, 'args': {}})
-    spiders_to_run.append({'spider': WdrSpider.Wdr1Spider, 'args': {}})
-    spiders_to_run.append({'spider': WdrSpider.Wdr2Spider, 'args': {}})
-    spiders_to_run.append({'spider': NRWLokalradiosSpider, 'args': {}})
-
-    for spider_to_run in spiders_to_run:
-        if spider_can_run(last_run_list, spider_to_run['spider'].name, spider_to_run['spider'].interval):
-            try:
-                process.crawl(spider_to_run['spider'], **spider_to_run['args'])
-                update_last_runs_list.append(spider_to_run['spider'].name)
-            except Exception as e:
-                print(f"Error when running spider {spider_to_run['spider'].name}!")
-                print(str(e))
-        else:
-            print(f"Skipping spider {spider_to_run['spider'].name}, interval not reached.")
+    specs = [get_spec(name) for name in names]
 
     try:
-        process.start()
+        if browser_port and sum(spec.group == BROWSER for spec in specs) > 1:
+            from twisted.internet import reactor
+
+            reactor.callWhenRunning(crawl_with_shared_browser, process, specs, browser_port)
+            process.start(stop_after_crawl=False)
+        else:
+            crawl(process, specs)
+            process.start()
     except Exception as e:
         print(f"Error while running scrapy!")
         print(str(e))
-    update_last_runs(update_last_runs_list)
+
+
+def crawl(process, specs: list):
+    for spec in specs:
+        try:
+            process.crawl(spec.load(), **spec.get_args())
+        except Exception as e:
+            print(f"Error when running spider {spec.name}!")
+            print(str(e))
+
+
+def crawl_with_shared_browser(process, specs: list, browser_port: int):
+    from scrapy.utils.defer import deferred_from_coro
+    from twisted.internet import defer, reactor
+    from playwright_contexts import SharedBrowser
+
+    @defer.inlineCallbacks
+    def start():
+        browser = SharedBrowser(browser_port)
+        try:
+            yield deferred_from_coro(browser.launch())
+            process.settings.set("PLAYWRIGHT_CDP_URL", browser.cdp_url)
+        except Exception as e:
+            # ohne gemeinsamen Browser startet jeder Crawler wie bisher sein eigenes Chromium
+            print(f"Could not launch shared Chromium on port {browser_port}: {e}")
+            browser = None
+        try:
+            crawl(process, specs)
+            yield process.join()
+        finally:
+            if browser is not None:
+                yield deferred_from_coro(browser.close())
+            if reactor.running:
+                reactor.stop()
+
+    return start()
+
+
+def run_groups(specs: list, browser_port: int | None = None):
+    """
+    Startet jede Ressourcenklasse (`SpiderSpec.group`) in einem eigenen Prozess mit eigenem
+    Reactor, sodass Chromium-Seiten und das Parsen der HTTP-Spider sich weder GIL noch
+    Reactor teilen. Eine Gruppe, die ihr Timeout aus `GROUP_TIMEOUTS` überschreitet, wird
+    beendet; ihre offenen Läufe werden im StateStore als `timeout` bzw. `crashed` abgeschlossen.
+    """
+    groups = {}
+    for spec in specs:
+        groups.setdefault(spec.group, []).append(spec.name)
+
+    # spawn statt fork: keine geerbten SQLite-Verbindungen, jeder Prozess installiert seinen Reactor selbst
+    context = multiprocessing.get_context("spawn")
+    started = time()
+    pending = {}
+    for group, names in groups.items():
+        worker = context.Process(target=run_spiders, args=(names, browser_port), name=f"spiders-{group}")
+        worker.start()
+        pending[group] = (worker, names, started + GROUP_TIMEOUTS.get(group, DEFAULT_GROUP_TIMEOUT))
+
+    while pending:
+        for group, (worker, names, deadline) in list(pending.items()):
+            status = None
+            if worker.is_alive():
+                if time() < deadline:
+                    continue
+                print(f"Spider group {group} timed out, stopping {', '.join(names)}.")
+                stop_worker(worker)
+                status = RUN_TIMEOUT
+            elif worker.exitcode != 0:
+                status = RUN_CRASHED
+            if status is not None:
+                get_state_store().abort_runs(names, started, status)
+            print(f"Spider group {group} ({', '.join(names)}) finished after {time() - started:.1f}s "
+                  f"with exit code {worker.exitcode}.")
+            del pending[group]
+        if pending:
+            next_deadline = min(deadline for _, _, deadline in pending.values())
+            wait([worker.sentinel for worker, _, _ in pending.values()], timeout=max(0.0, next_deadline - time()))
+
+
+def stop_worker(worker, grace: float = 30.0):
+    # das erste SIGTERM lässt Scrapy die Spider noch sauber schließen
+    worker.terminate()
+    worker.join(grace)
+    if worker.is_alive():
+        worker.kill()
+        worker.join()
 
 
 def get_last_runs() -> dict:
-    if not os.path.isfile("data/last_runs.json"):
-        return {}
-    else:
-        with open("data/last_runs.json", "r") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return {}
+    state_store = get_state_store()
+    # alten Stand aus last_runs.json einmalig übernehmen
+    state_store.import_last_runs("data/last_runs.json")
+    return state_store.last_successful_runs()
 
 
-def update_last_runs(last_runs_list: list):
-    time = datetime.now(timezone.utc).timestamp()
-    last_runs = get_last_runs()
-    for last_run in last_runs_list:
-        last_runs[last_run] = time
-    with open("data/last_runs.json", "w") as f:
-        json.dump(last_runs, f)
+def spider_is_due(spec, last_run_list: dict) -> bool:
+    """
+    Adaptive Spider laufen, sobald `adaptive_run_time` erreicht ist. Im Cron-Modus kann das
+    nur so genau sein wie der Cron-Takt, dafür besser den Daemon verwenden.
+    """
+    window = get_state_store().poll_window(spec.name) if spec.adaptive else None
+    if window is None:
+        return spider_can_run(last_run_list, spec.name, spec.interval)
+    return adaptive_run_time(last_run_list.get(spec.name), *window) <= time()
 
 
 def spider_can_run(last_run_list: dict, spider_name: str, interval: int) -> bool:
@@ -98,4 +180,23 @@ def spider_can_run(last_run_list: dict, spider_name: str, interval: int) -> bool
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Startet alle fälligen Spider.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Dauerhaft laufen und jeden Spider zu seinem Intervall starten, statt einmalig per Cron.")
+    parser.add_argument("--browser-port", type=int, default=9222,
+                        help="Debugging-Port des gemeinsamen Chromium der Browser-Spider (Daemon und Cron-Modus), "
+                             "0 für einen Browser pro Spider.")
+    parser.add_argument("--no-isolation", action="store_true",
+                        help="Alle Spider in einem Prozess starten statt einem Prozess pro Ressourcenklasse.")
+    parser.add_argument("--profile", action="append", metavar="SPIDER",
+                        help="Parse-Callbacks dieses Spiders profilen (mehrfach möglich, 'all' für alle), "
+                             "Ergebnis unter data/profiles/.")
+    args = parser.parse_args()
+    if args.profile:
+        from profiling import PROFILE_ENV
+        os.environ[PROFILE_ENV] = ",".join(args.profile)
+    if args.daemon:
+        from scheduler import run_daemon
+        run_daemon(browser_port=args.browser_port)
+    else:
+        run(isolate=not args.no_isolation, browser_port=args.browser_port)
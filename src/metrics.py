@@ -0,0 +1,162 @@
+import functools
+import inspect
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from time import perf_counter
+
+"""
+Leichtgewichtige Metriken für die heißen Pfade eines Crawls.
+
+Zähler und Latenz-Histogramme werden prozessweit in `REGISTRY` gesammelt und von der
+Extension `extensions.MetricsExporter` im Prometheus-Textformat für den Textfile-Collector
+des node-exporters geschrieben. `@timed` misst die Laufzeit von Spider-Methoden
+(Parse-Callbacks, Schreiben der Snapshots) mit dem Spider-Namen als Label.
+"""
+
+PREFIX = "radio_scraper_"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "function_duration_seconds": "Laufzeit instrumentierter Spider-Methoden",
+    "download_duration_seconds": "Dauer eines Downloads nach Download-Handler",
+    "downloaded_bytes_total": "Geladene Bytes (Response-Body)",
+    "written_bytes_total": "Als Snapshot geschriebene Bytes (unkomprimiert)",
+    "writer_pauses_total": "Pausen der Engine, weil der Snapshot-Writer voll war",
+    "items_total": "Erzeugte Items",
+    "responses_total": "Antworten nach HTTP-Status",
+    "retries_total": "Wiederholte Anfragen (RetryMiddleware)",
+    "runs_total": "Beendete Läufe nach Grund",
+    "playwright_browsers_total": "Gestartete bzw. per CDP verbundene Browser",
+    "playwright_pages_total": "Geöffnete Playwright-Seiten",
+    "playwright_aborted_requests_total": "Von PLAYWRIGHT_ABORT_REQUEST abgebrochene Anfragen",
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-sicher, da Snapshots im Writer-Thread geschrieben werden."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self, spider: str | None = None) -> str:
+        """Prometheus-Textformat, auf Wunsch nur die Serien eines Spiders."""
+        def selected(labels: tuple) -> bool:
+            return spider is None or ("spider", spider) in labels
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                series = [(labels, value) for (n, labels), value in self.counters.items() if n == name and selected(labels)]
+                if not series:
+                    continue
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(series):
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                series = [(labels, h) for (n, labels), h in self.histograms.items() if n == name and selected(labels)]
+                if not series:
+                    continue
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in sorted(series, key=lambda s: s[0]):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(method):
+    """
+    Misst die Laufzeit einer Spider-Methode als `function_duration_seconds{spider, function}`.
+    Bei Generatoren (Parse-Callbacks) zählt nur die Zeit im Generator selbst, nicht die der
+    Pipelines, die die Items zwischendurch verarbeiten.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            elapsed = 0.0
+            generator = method(self, *args, **kwargs)
+            try:
+                while True:
+                    started = perf_counter()
+                    try:
+                        value = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += perf_counter() - started
+                    yield value
+            finally:
+                generator.close()
+                REGISTRY.observe("function_duration_seconds", elapsed, spider=self.name, function=method.__name__)
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            REGISTRY.observe("function_duration_seconds", perf_counter() - started,
+                             spider=self.name, function=method.__name__)
+    return wrapper
+
+
+def write_textfile(path: str, text: str):
+    """Schreibt atomar, damit der node-exporter nie eine halbe Datei liest."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,100 @@
+import json
+import os
+from pathlib import Path
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request, Response
+
+from settings import DATA_PATH
+
+
+class ConditionalGetMiddleware:
+    """
+    Downloader-Middleware für bedingte GET-Anfragen.
+
+    Merkt sich pro URL `ETag` und `Last-Modified` der letzten Antwort und sendet
+    sie beim nächsten Abruf als `If-None-Match` bzw. `If-Modified-Since` mit.
+    Antwortet der Server mit 304, wird die Anfrage verworfen: kein Download,
+    kein Parsen, kein Schreiben.
+
+    Aktiv nur für Spider mit `conditional_get = True` und nicht für Playwright-Anfragen.
+    Der Cache liegt pro Spider in `DATA_PATH/<spider>/validators.json`.
+    """
+
+    def __init__(self, crawler: Crawler):
+        self.stats = crawler.stats
+        self.validators = {}
+        self.dirty = False
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    @staticmethod
+    def cache_path(spider: Spider) -> str:
+        return os.path.join(DATA_PATH, spider.name, "validators.json")
+
+    @staticmethod
+    def is_enabled(request: Request, spider: Spider) -> bool:
+        return (
+            getattr(spider, "conditional_get", False)
+            and request.method == "GET"
+            and not request.meta.get("playwright")
+        )
+
+    def spider_opened(self, spider: Spider):
+        if not getattr(spider, "conditional_get", False):
+            return
+        path = self.cache_path(spider)
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                try:
+                    self.validators = json.load(f)
+                except Exception:
+                    self.validators = {}
+
+    def spider_closed(self, spider: Spider):
+        if not self.dirty:
+            return
+        path = self.cache_path(spider)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.validators, f)
+        os.replace(path + ".tmp", path)
+
+    def process_request(self, request: Request, spider: Spider):
+        if not self.is_enabled(request, spider):
+            return None
+        cached = self.validators.get(request.url)
+        if cached:
+            if cached.get("etag"):
+                request.headers.setdefault("If-None-Match", cached["etag"])
+            if cached.get("last_modified"):
+                request.headers.setdefault("If-Modified-Since", cached["last_modified"])
+        return None
+
+    def process_response(self, request: Request, response: Response, spider: Spider):
+        if not self.is_enabled(request, spider):
+            return response
+
+        if response.status == 304:
+            cached = self.validators.get(request.url, {})
+            self.stats.inc_value("conditional_get/not_modified", spider=spider)
+            self.stats.inc_value("conditional_get/bytes_saved", cached.get("size", 0), spider=spider)
+            raise IgnoreRequest(f"Not modified since last crawl: {request.url}")
+
+        if response.status == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.validators[request.url] = {
+                    "etag": etag.decode("latin-1") if etag else None,
+                    "last_modified": last_modified.decode("latin-1") if last_modified else None,
+                    "size": len(response.body),
+                }
+                self.dirty = True
+        return response
@@ -0,0 +1,125 @@
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from scrapy import Spider
+from twisted.internet.defer import Deferred
+
+from settings import DATA_PATH
+from snapshot_writer import BackgroundWriter, write_snapshot
+
+
+class ParsedOutputPipeline:
+    """
+    Schreibt die JSON-Dateien unter `DATA_PATH/<spider>/parsed/`.
+
+    Items mit `parsed_file` werden gepuffert und gruppiert nach Datei in Batches von
+    `PARSED_OUTPUT_BATCH_SIZE` Einträgen geschrieben; in jede Zeile kommen die Felder aus
+    `parsed_fields` der Item-Klasse. Das Schreiben läuft in einem Hintergrund-Thread, höchstens
+    `PARSED_OUTPUT_MAX_PENDING` Batches sind gleichzeitig offen (Backpressure auf den Crawl).
+    `PARSED_OUTPUT_FSYNC` schreibt jede Datei vor dem Umbenennen auf die Platte.
+    Landet eine Datei auf zwei Batches, wird sie beim zweiten Mal ergänzt statt überschrieben.
+    Ohne Reactor (reparse.py) mit `background=False`: dann schreibt `flush` direkt.
+
+    Slots, die der Spider bis zu einem Batch als erledigt markiert hat, werden erst gespeichert,
+    wenn dieser Batch geschrieben ist; scheitert das Schreiben, gelten sie als fehlgeschlagen.
+    """
+
+    def __init__(self, directory: str, batch_size: int, max_pending: int, fsync: bool, stats=None,
+                 background: bool = True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.stats = stats
+        self.background = background
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            directory=settings.get("PARSED_OUTPUT_DIRECTORY", DATA_PATH),
+            batch_size=settings.getint("PARSED_OUTPUT_BATCH_SIZE", 500),
+            max_pending=settings.getint("PARSED_OUTPUT_MAX_PENDING", 8),
+            fsync=settings.getbool("PARSED_OUTPUT_FSYNC", False),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider: Spider):
+        self.buffer = defaultdict(list)
+        self.buffered = 0
+        # in diesem Lauf bereits geschriebene Dateien, weitere Einträge werden angehängt
+        self.written = set()
+        # ein Thread, damit Batches derselben Datei in Reihenfolge geschrieben werden
+        self.writer = BackgroundWriter(max_workers=1, max_pending=self.max_pending) if self.background else None
+
+    def process_item(self, item, spider: Spider):
+        parsed_file = item.get("parsed_file") if hasattr(item, "parsed_fields") else None
+        if not parsed_file:
+            return item
+        self.buffer[parsed_file].append({name: item.get(name) for name in item.parsed_fields})
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            deferred = self.flush(spider)
+            if deferred is not None:
+                # das Item bleibt offen, bis sein Batch geschrieben ist: Backpressure auf den Crawl
+                deferred.addCallback(lambda _: item)
+                return deferred
+        return item
+
+    def flush(self, spider: Spider) -> Deferred | None:
+        """
+        Übergibt alle gepufferten Einträge an den Writer. Das Deferred feuert, wenn der Batch
+        geschrieben ist; sind schon `max_pending` Batches offen, wartet er ohne zu blockieren.
+        """
+        if not self.buffered:
+            return None
+        batch, self.buffer, self.buffered = self.buffer, defaultdict(list), 0
+        paths = {}
+        for parsed_file, rows in batch.items():
+            path = os.path.join(self.directory, spider.name, "parsed", parsed_file)
+            paths[path] = (rows, path in self.written)
+            self.written.add(path)
+        if self.stats:
+            self.stats.inc_value("parsed_output/batches", spider=spider)
+        # alle bis jetzt markierten Slots haben ihre Items in diesem oder einem früheren Batch
+        slots = spider.take_pending_slots() if hasattr(spider, "take_pending_slots") else []
+        if self.writer is None:
+            self.write_batch(paths, self.fsync, spider)
+            if slots:
+                spider.store_slots(slots)
+            return None
+        deferred = self.writer.submit(self.write_batch, paths, self.fsync, spider)
+        deferred.addCallbacks(
+            lambda _: self.batch_written(slots, spider),
+            lambda failure: self.batch_failed(failure, slots, spider),
+        )
+        return deferred
+
+    def batch_written(self, slots: list, spider: Spider):
+        if slots:
+            spider.store_slots(slots)
+
+    def batch_failed(self, failure, slots: list, spider: Spider):
+        spider.logger.error(f"Could not write parsed output: {failure.value}")
+        if hasattr(spider, "writes_failed"):
+            spider.writes_failed(slots)
+        return failure
+
+    def close_spider(self, spider: Spider):
+        self.flush(spider)
+        if self.writer is not None:
+            return self.writer.close()
+
+    def write_batch(self, paths: dict, fsync: bool, spider: Spider):
+        for path, (rows, append) in paths.items():
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            if append and os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    rows = json.load(f) + rows
+            body = json.dumps(rows, ensure_ascii=False, indent=4).encode("utf-8")
+            write_snapshot(path, body, fsync=fsync)
+            spider.logger.info(f"Wrote {len(rows)} entries to {path}")
+            if self.stats:
+                self.stats.inc_value("parsed_output/files", spider=spider)
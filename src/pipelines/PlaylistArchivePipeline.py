@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from scrapy import Spider
+from twisted.internet.threads import deferToThread
+
+import archive
+from items import PlaylistItem
+
+
+class PlaylistArchivePipeline:
+    """
+    Sammelt alle `PlaylistItem`s eines Laufs und hängt sie beim Schließen des Spiders
+    an das Parquet-Archiv (`archive.py`) an, eine Datei pro Sender und Monat.
+    Andere Items werden unverändert durchgereicht.
+    """
+
+    def open_spider(self, spider: Spider):
+        self.partitions = defaultdict(list)
+
+    def process_item(self, item, spider: Spider):
+        if not isinstance(item, PlaylistItem) or not item.get("datetime"):
+            return item
+        try:
+            dt = archive.parse_datetime(item["datetime"])
+        except ValueError:
+            spider.logger.warning(f"Cannot archive item with invalid datetime {item['datetime']!r}")
+            return item
+
+        source = item.get("source") or spider.name
+        self.partitions[(source, archive.month_key(dt))].append({
+            "datetime": dt,
+            "title": item.get("title"),
+            "performer": item.get("performer"),
+            "source": source,
+        })
+        return item
+
+    def close_spider(self, spider: Spider):
+        if self.partitions:
+            return deferToThread(self.flush, spider)
+
+    def flush(self, spider: Spider):
+        """Schreibt alle bisher gesammelten Einträge ins Archiv (auch zwischendurch, z.B. in reparse.py)."""
+        partitions, self.partitions = self.partitions, defaultdict(list)
+        self.write_partitions(partitions, spider)
+
+    @staticmethod
+    def write_partitions(partitions: dict, spider: Spider):
+        for (source, month), rows in partitions.items():
+            archive.append_rows(source, month, rows)
+            spider.logger.info(f"Archived {len(rows)} entries to {archive.archive_path(source, month)}")
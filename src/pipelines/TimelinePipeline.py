@@ -0,0 +1,71 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from scrapy import Spider
+from twisted.internet.threads import deferToThread
+
+import archive
+import timeline
+from items import PlaylistItem
+
+
+class TimelinePipeline:
+    """
+    Faltet die `PlaylistItem`s eines Laufs beim Schließen des Spiders in die Zeitleisten
+    (`timeline.py`) ein. Jede Datei unter `parsed/` ist ein Batch, der den Zeitraum seiner
+    Einträge abdeckt; Lücken der letzten `TIMELINE_GAP_LOOKBACK_DAYS` Tage (Standard 2)
+    werden als Warnung geloggt. Abschalten mit `TIMELINE_ENABLED = False`.
+    """
+
+    def __init__(self, enabled: bool, directory: str, lookback_days: int):
+        self.enabled = enabled
+        self.directory = directory
+        self.lookback_days = lookback_days
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            enabled=settings.getbool("TIMELINE_ENABLED", True),
+            directory=settings.get("TIMELINE_DIRECTORY", timeline.TIMELINE_DIRECTORY),
+            lookback_days=settings.getint("TIMELINE_GAP_LOOKBACK_DAYS", 2),
+        )
+
+    def open_spider(self, spider: Spider):
+        self.batches = defaultdict(list)
+
+    def process_item(self, item, spider: Spider):
+        if not self.enabled or not isinstance(item, PlaylistItem) or not item.get("datetime"):
+            return item
+        try:
+            dt = archive.parse_datetime(item["datetime"])
+        except ValueError:
+            return item
+        source = item.get("source") or spider.name
+        self.batches[(source, item.get("parsed_file"))].append({
+            "datetime": dt,
+            "title": item.get("title"),
+            "performer": item.get("performer"),
+        })
+        return item
+
+    def close_spider(self, spider: Spider):
+        if self.batches:
+            return deferToThread(self.flush, spider)
+
+    def flush(self, spider: Spider):
+        batches, self.batches = self.batches, defaultdict(list)
+        stations = defaultdict(list)
+        for (source, _), rows in batches.items():
+            stations[source].append(rows)
+
+        since = int((datetime.now(timezone.utc) - timedelta(days=self.lookback_days)).timestamp())
+        for station, station_batches in stations.items():
+            station_timeline = timeline.load_timeline(station, self.directory)
+            added = sum(station_timeline.fold(timeline.make_entries(rows)) for rows in station_batches)
+            timeline.save_timeline(station_timeline, self.directory)
+            spider.logger.info(f"Added {added} new entries to the timeline of {station} ({len(station_timeline)} total)")
+            for gap_start, gap_end in station_timeline.gaps(start=since):
+                spider.logger.warning(
+                    f"Gap in the timeline of {station}: {timeline.format_time(gap_start)} - {timeline.format_time(gap_end)}"
+                )
@@ -0,0 +1,99 @@
+from urllib.parse import urlparse
+
+# Ressourcen, die für das Auslesen von Moderator und Schlagzeilen nie gebraucht werden
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+LANDING_PAGE_CONTEXT = "landing_page"
+
+BROWSER_ARGS = ["--disable-gpu", "--disable-extensions", "--mute-audio"]
+
+
+class ResourceBlocker:
+    """
+    Prädikat für `PLAYWRIGHT_ABORT_REQUEST`.
+    Bricht Anfragen auf blockierte Ressourcentypen sowie alle Anfragen an
+    Drittanbieter (Werbung, Tracker, CDNs fremder Domains) ab.
+    """
+
+    def __init__(self, first_party_domains: tuple[str, ...], blocked_resource_types=BLOCKED_RESOURCE_TYPES):
+        self.first_party_domains = tuple(d.lower().lstrip(".") for d in first_party_domains)
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+
+    def is_first_party(self, url: str) -> bool:
+        host = urlparse(url).hostname
+        if host is None:
+            # data:, blob: und ähnliche URLs haben keinen Host und bleiben erlaubt
+            return True
+        host = host.lower()
+        return any(host == d or host.endswith("." + d) for d in self.first_party_domains)
+
+    def __call__(self, request) -> bool:
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        return not self.is_first_party(request.url)
+
+
+def landing_page_settings(first_party_domains: tuple[str, ...], max_pages_per_context: int = 2) -> dict:
+    """
+    Liefert `custom_settings` für die stündlichen Startseiten-Spider.
+    Die Seiten eines Spiders laufen in einem wiederverwendeten Kontext `LANDING_PAGE_CONTEXT`,
+    dessen gleichzeitig offene Seiten auf `max_pages_per_context` begrenzt sind. Jeder Crawler
+    hat seinen eigenen Download-Handler und damit seinen eigenen Kontext; den Browser teilen
+    sich die Spider nur, wenn `PLAYWRIGHT_CDP_URL` auf einen `SharedBrowser` zeigt (Daemon und
+    Browser-Gruppe in `main.run_spiders`), sonst startet jeder Crawler ein eigenes Chromium.
+    """
+    return {
+        "PLAYWRIGHT_ABORT_REQUEST": ResourceBlocker(first_party_domains),
+        "PLAYWRIGHT_CONTEXTS": {
+            LANDING_PAGE_CONTEXT: {
+                "service_workers": "block",
+                "viewport": {"width": 1280, "height": 800},
+            },
+        },
+        "PLAYWRIGHT_MAX_CONTEXTS": 1,
+        "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": max_pages_per_context,
+        "PLAYWRIGHT_LAUNCH_OPTIONS": {
+            "args": BROWSER_ARGS,
+        },
+    }
+
+
+def landing_page_meta(page_methods: list) -> dict:
+    """Request-Meta für eine Startseite im gemeinsamen Kontext."""
+    return {
+        "playwright": True,
+        "playwright_context": LANDING_PAGE_CONTEXT,
+        # Die PageMethods warten selbst auf die benötigten Elemente
+        "playwright_page_goto_kwargs": {"wait_until": "domcontentloaded"},
+        "playwright_page_methods": page_methods,
+    }
+
+
+class SharedBrowser:
+    """
+    Ein Chromium mit Debugging-Port, mit dem sich alle Crawler eines Prozesses per CDP
+    verbinden (`PLAYWRIGHT_CDP_URL`), statt jeweils einen eigenen Browser zu starten.
+    """
+
+    def __init__(self, port: int):
+        self.port = port
+        self.playwright = None
+        self.browser = None
+
+    @property
+    def cdp_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def launch(self):
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(
+            args=[f"--remote-debugging-port={self.port}", *BROWSER_ARGS]
+        )
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
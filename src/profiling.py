@@ -0,0 +1,164 @@
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from settings import DATA_PATH
+
+"""
+Optionales Profiling einzelner Spider, ohne `main.py` anzupassen.
+
+Aktiviert wird es über die Umgebungsvariable `RADIO_SCRAPER_PROFILE` (Spider-Namen mit Komma
+getrennt oder `all`) bzw. `python src/main.py --profile <spider>`. Für diese Spider werden die
+Parse-Callbacks und `save_response` mit cProfile gemessen; zusätzlich nimmt ein Sampler-Thread
+in diesen Methoden alle `RADIO_SCRAPER_PROFILE_INTERVAL` Sekunden den Stack auf. Am Ende des
+Laufs landen unter `data/profiles/<spider>/<zeitstempel>/`:
+
+    <spider>.pstats      für `python -m pstats` oder snakeviz
+    <spider>.collapsed   gefaltete Stacks für flamegraph.pl bzw. speedscope
+
+Welche Methoden gemessen werden, lässt sich mit `RADIO_SCRAPER_PROFILE_FUNCTIONS` überschreiben.
+Ist nichts gesetzt, bleiben die Spider unverändert und es entsteht kein Overhead.
+"""
+
+PROFILE_ENV = "RADIO_SCRAPER_PROFILE"
+FUNCTIONS_ENV = "RADIO_SCRAPER_PROFILE_FUNCTIONS"
+INTERVAL_ENV = "RADIO_SCRAPER_PROFILE_INTERVAL"
+PROFILE_DIRECTORY = os.path.join(DATA_PATH, "profiles")
+
+logger = logging.getLogger(__name__)
+
+
+def profiled_spiders() -> set:
+    value = os.environ.get(PROFILE_ENV, "")
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def enabled_for(spider_name: str) -> bool:
+    names = profiled_spiders()
+    return "all" in names or spider_name in names
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SpiderProfiler:
+    """
+    cProfile und Stack-Sampler für einen Spider. Gemessen wird nur, solange eine der
+    umhüllten Methoden läuft; bei Generatoren nur die Zeit im Generator selbst.
+    """
+
+    def __init__(self, spider_name: str, directory: str = PROFILE_DIRECTORY, interval: float = 0.005):
+        self.spider_name = spider_name
+        self.directory = directory
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.samples = Counter()
+        self.depth = 0
+        # Thread, in dem die umhüllten Methoden laufen (der Reactor)
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name=f"profiler-{spider_name}", daemon=True)
+        self.sampler.start()
+
+    def enter(self):
+        if self.depth == 0:
+            self.thread_id = threading.get_ident()
+            self.profile.enable()
+        self.depth += 1
+
+    def exit(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.profile.disable()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            if self.depth == 0:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def wrap(self, method):
+        """Umhüllt eine gebundene Methode, Generatoren werden bei jedem Schritt gemessen."""
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(*args, **kwargs):
+                generator = method(*args, **kwargs)
+                try:
+                    while True:
+                        self.enter()
+                        try:
+                            value = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            self.exit()
+                        yield value
+                finally:
+                    generator.close()
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            self.enter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    def install(self, spider, functions: tuple):
+        for name in functions:
+            method = getattr(spider, name, None)
+            if callable(method):
+                setattr(spider, name, self.wrap(method))
+
+    def dump(self) -> str:
+        """Beendet den Sampler und schreibt `.pstats` und `.collapsed`, gibt das Verzeichnis zurück."""
+        self.stopped.set()
+        self.sampler.join()
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%S")
+        directory = os.path.join(self.directory, self.spider_name, timestamp)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(os.path.join(directory, f"{self.spider_name}.pstats"))
+        with open(os.path.join(directory, f"{self.spider_name}.collapsed"), "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return directory
+
+
+def install(spider, crawler):
+    """Hängt einen `SpiderProfiler` an `spider`, geschrieben wird beim Schließen des Spiders."""
+    from scrapy import signals
+
+    functions = os.environ.get(FUNCTIONS_ENV)
+    if functions:
+        functions = tuple(name.strip() for name in functions.split(",") if name.strip())
+    else:
+        functions = tuple(dict.fromkeys(("parse", spider.replay_callback, "save_response")))
+    profiler = SpiderProfiler(spider.name, interval=float(os.environ.get(INTERVAL_ENV, 0.005)))
+    profiler.install(spider, functions)
+
+    def spider_closed(spider):
+        directory = profiler.dump()
+        logger.info(f"Wrote profile of {spider.name} to {directory}")
+
+    # der Handler muss am Profiler hängen, Scrapys Signale halten nur schwache Referenzen
+    profiler.spider_closed = spider_closed
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed)
+    spider.profiler = profiler
+    return profiler
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+import pyarrow as pa
+
+import archive
+from song_catalog import get_song_catalog
+
+"""
+Abfragen über das Playlist-Archiv (`archive.py`) nach Sender oder Song-ID und Zeitraum.
+
+Das Archiv ist pro Sender und Monat partitioniert und innerhalb jeder Datei nach Zeit
+sortiert. Eine Abfrage öffnet nur die Monate im Zeitraum und sucht Anfang und Ende per
+Binärsuche; zuletzt verwendete Monate bleiben im Speicher, wiederholte Abfragen lesen
+dann keine Datei mehr. Lange Zeiträume werden Monat für Monat gestreamt.
+
+Beispiel:
+    python src/query.py station wdr2 --start 2025-05-14T14:00 --end 2025-05-14T15:00
+    python src/query.py song 4711 --start 2025-05-01 --end 2025-06-01 --json
+"""
+
+# so viele Zeilen werden beim Streamen auf einmal in Python-Objekte umgewandelt
+BATCH_SIZE = 1024
+
+
+def months_between(start: datetime, end: datetime) -> list:
+    """Monats-Schlüssel (UTC) aller Monate, die der Zeitraum `start <= t < end` berührt."""
+    if end <= start:
+        return []
+    last = end - timedelta(seconds=1)
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (last.year, last.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class MonthPartition:
+    """Ein geladener Sender-Monat mit Zeitstempeln (Sekunden) für die Binärsuche."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self.timestamps = table.column("datetime").cast(pa.int64()).to_pylist()
+        self._song_rows = None
+
+    def time_range(self, start: int, end: int) -> tuple:
+        return bisect_left(self.timestamps, start), bisect_left(self.timestamps, end)
+
+    def song_rows(self) -> dict:
+        """Zeilennummern je Song-ID, wird bei der ersten Song-Abfrage aufgebaut."""
+        if self._song_rows is None:
+            self._song_rows = {}
+            for row, song_id in enumerate(self.table.column("song_id").to_pylist()):
+                if song_id is not None:
+                    self._song_rows.setdefault(song_id, []).append(row)
+        return self._song_rows
+
+
+class PlaylistQuery:
+    """
+    Abfragen über das Archiv. Hält bis zu `cache_size` Sender-Monate im Speicher;
+    ändert sich eine Archivdatei, wird sie beim nächsten Zugriff neu geladen.
+    """
+
+    def __init__(self, archive_directory: str = archive.ARCHIVE_DIRECTORY, cache_size: int = 24):
+        self.archive_directory = archive_directory
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def stations(self) -> list:
+        if not os.path.isdir(self.archive_directory):
+            return []
+        return sorted(
+            entry.name for entry in os.scandir(self.archive_directory) if entry.is_dir()
+        )
+
+    def partition(self, station: str, month: str) -> MonthPartition | None:
+        path = archive.archive_path(station, month, self.archive_directory)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (station, month)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            self.cache.move_to_end(key)
+            return cached[1]
+        partition = MonthPartition(archive.read_table(path))
+        self.cache[key] = (mtime, partition)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return partition
+
+    def by_station(self, station: str, start: datetime, end: datetime) -> Iterator[dict]:
+        """Alle Einträge eines Senders mit `start <= datetime < end`, nach Zeit sortiert."""
+        start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+        first, last = int(start.timestamp()), int(end.timestamp())
+        for month in months_between(start, end):
+            partition = self.partition(station, month)
+            if partition is None:
+                continue
+            lo, hi = partition.time_range(first, last)
+            for offset in range(lo, hi, BATCH_SIZE):
+                yield from partition.table.slice(offset, min(BATCH_SIZE, hi - offset)).to_pylist()
+
+    def by_song(self, song_id: int, start: datetime, end: datetime, stations: list | None = None) -> Iterator[dict]:
+        """Alle Einsätze eines Songs im Zeitraum, nach Monat und innerhalb des Monats nach Sender."""
+        start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+        first, last = int(start.timestamp()), int(end.timestamp())
+        stations = stations or self.stations()
+        for month in months_between(start, end):
+            for station in stations:
+                partition = self.partition(station, month)
+                if partition is None:
+                    continue
+                lo, hi = partition.time_range(first, last)
+                rows = [row for row in partition.song_rows().get(song_id, ()) if lo <= row < hi]
+                if rows:
+                    yield from partition.table.take(rows).to_pylist()
+
+
+def format_row(row: dict) -> str:
+    local = row["datetime"].astimezone(archive.DEFAULT_ZONE).isoformat(timespec="minutes")
+    return f"{local}  {row['source']:<20} {row['performer'] or ''} - {row['title'] or ''}  [{row['song_id']}]"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Playlist-Archiv nach Sender oder Song abfragen.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    station_parser = subparsers.add_parser("station", help="Einträge eines Senders")
+    station_parser.add_argument("station")
+    song_parser = subparsers.add_parser("song", help="Einsätze eines Songs (ID aus dem Song-Katalog)")
+    song_parser.add_argument("song_id", type=int)
+    song_parser.add_argument("--station", action="append", dest="stations", help="nur diese Sender (mehrfach möglich)")
+    for sub in (station_parser, song_parser):
+        sub.add_argument("--start", required=True, help="Beginn, ISO 8601 (ohne Zone: deutsche Zeit)")
+        sub.add_argument("--end", required=True, help="Ende (exklusiv), ISO 8601")
+        sub.add_argument("--json", action="store_true", help="eine JSON-Zeile pro Eintrag ausgeben")
+    args = parser.parse_args()
+
+    start, end = archive.parse_datetime(args.start), archive.parse_datetime(args.end)
+    query = PlaylistQuery()
+    if args.mode == "station":
+        rows = query.by_station(args.station, start, end)
+    else:
+        if get_song_catalog().get(args.song_id) is None:
+            parser.error(f"unknown song id {args.song_id}")
+        rows = query.by_song(args.song_id, start, end, args.stations)
+
+    for row in rows:
+        if args.json:
+            sys.stdout.write(json.dumps({**row, "datetime": row["datetime"].isoformat()}, ensure_ascii=False) + "\n")
+        else:
+            sys.stdout.write(format_row(row) + "\n")
@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from importlib import import_module
+from typing import Callable
+
+"""
+Deklaratives Verzeichnis aller regelmäßig laufenden Spider.
+
+Hier stehen nur Name, Intervall, Modulpfad und Argumente. Die Spider-Module (und damit
+Scrapy und scrapy_playwright) werden erst importiert, wenn ein Spider tatsächlich fällig ist.
+Neue Spider müssen hier eingetragen werden, damit `main.py` sie startet.
+"""
+
+
+def yesterday_range() -> dict:
+    # Download once a day, for the previous day
+    start_date = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+    return {'start_date_param': start_date, 'end_date_param': start_date}
+
+
+# Chromium per Playwright
+BROWSER = "browser"
+# HTML-Seiten über Scrapys HTTP-Downloader, CPU-lastig beim Parsen
+HTTP = "http"
+# JSON-Schnittstellen; der Browser wird nur als Fallback gestartet (SRF3)
+API = "api"
+
+
+@dataclass(frozen=True)
+class SpiderSpec:
+    name: str
+    interval: int
+    module: str
+    class_name: str
+    # liefert die Argumente für `process.crawl`, wird bei jedem Start neu aufgerufen
+    args: Callable[[], dict] | None = None
+    # Ressourcenklasse, jede Gruppe läuft in `main.run()` in einem eigenen Prozess
+    group: str = HTTP
+    # Abfrage nach der beobachteten Zeitspanne der Seite statt fest nach `interval`,
+    # siehe `adaptive_run_time`; `interval` gilt, solange noch keine Spanne bekannt ist
+    adaptive: bool = False
+
+    def load(self):
+        """Importiert das Spider-Modul und gibt die Spider-Klasse zurück."""
+        return getattr(import_module(self.module), self.class_name)
+
+    def get_args(self) -> dict:
+        return self.args() if self.args else {}
+
+
+HOURLY = 60 * 60
+DAILY = 60 * 60 * 24
+WEEKLY = 60 * 60 * 24 * 7
+
+# maximale Laufzeit einer Gruppe, danach wird ihr Prozess beendet
+GROUP_TIMEOUTS = {
+    BROWSER: 20 * 60,
+    HTTP: 30 * 60,
+    API: 30 * 60,
+}
+
+# Grenzen für adaptiv abgefragte Spider: nie öfter bzw. nie seltener als so
+ADAPTIVE_MIN_INTERVAL = 15 * 60
+ADAPTIVE_MAX_INTERVAL = 6 * 60 * 60
+# Sicherheitsabstand vor dem Herausrollen des letzten Eintrags: Anteil der Spanne, mindestens POLL_MARGIN_MIN
+POLL_MARGIN = 0.2
+POLL_MARGIN_MIN = 10 * 60
+
+
+def adaptive_run_time(last_run: float | None, window: float, observed_at: float) -> float:
+    """
+    Nächster Abruf (Unix-Zeit) einer Seite, die beim Abruf `observed_at` die letzten `window`
+    Sekunden zeigte. Spätestens nach `window` ist alles, was damals zu sehen war, herausgerollt;
+    abgefragt wird also kurz davor, mit Abstand `max(POLL_MARGIN_MIN, POLL_MARGIN * window)`.
+    """
+    margin = max(POLL_MARGIN_MIN, window * POLL_MARGIN)
+    due = observed_at + window - margin
+    if last_run is not None:
+        due = min(max(due, last_run + ADAPTIVE_MIN_INTERVAL), last_run + ADAPTIVE_MAX_INTERVAL)
+    return due
+
+
+SPIDERS = [
+    SpiderSpec("swr1_rp_playlist", DAILY, "SWR1RpPlaylistSpider", "SWR1RpPlaylistSpider", yesterday_range),
+    SpiderSpec("swr3_playlist", DAILY, "SWR3PlaylistSpider", "SWR3PlaylistSpider", yesterday_range),
+    SpiderSpec("srf3_playlist", DAILY, "SRF3PlaylistSpider", "SRF3PlaylistSpider", yesterday_range, group=API),
+    SpiderSpec("swr1_rp_landing_page", HOURLY, "SWR1RpLandingPage", "SWR1RpLandingPage", group=BROWSER),
+    SpiderSpec("swr3_landing_page", HOURLY, "SWR3LandingPage", "SWR3LandingPage", group=BROWSER),
+    SpiderSpec("srf3_landing_page", HOURLY, "SRF3LandingPage", "SRF3LandingPage", group=BROWSER),
+    SpiderSpec("OffizielleCharts", WEEKLY, "OffizielleChartsSpider", "OffizielleChartsSpider"),
+    SpiderSpec("DLFNova", DAILY, "DLFNovaSpider", "DLFNovaSpider"),
+    SpiderSpec("1live", HOURLY, "WdrSpider", "Wdr1Spider", adaptive=True),
+    SpiderSpec("wdr2", HOURLY, "WdrSpider", "Wdr2Spider", adaptive=True),
+    SpiderSpec("NRWLokalradios", DAILY, "NRWLokalradiosSpider", "NRWLokalradiosSpider", group=API),
+]
+
+
+def get_spec(name: str) -> SpiderSpec:
+    for spec in SPIDERS:
+        if spec.name == name:
+            return spec
+    raise KeyError(f"No spider named {name!r} in the registry")
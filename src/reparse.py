@@ -0,0 +1,199 @@
+import argparse
+import gzip
+import logging
+import mimetypes
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from time import time
+from typing import NamedTuple
+
+from scrapy import Item, Spider
+from scrapy.http import Headers, Request
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.spider import iterate_spider_output
+
+from pipelines.ParsedOutputPipeline import ParsedOutputPipeline
+from pipelines.PlaylistArchivePipeline import PlaylistArchivePipeline
+from registry import SPIDERS, get_spec
+from settings import DATA_PATH
+from snapshot_store import SnapshotStore
+
+"""
+Parst gespeicherte Roh-Snapshots erneut, ohne die Seiten neu zu laden.
+
+Nach einer Änderung an einem Parser werden alle Snapshots unter `DATA_PATH/<spider>/`
+(einzelne Dateien und Einträge im SnapshotStore-Manifest) als Response-Objekte durch den
+Callback des Spiders geschickt. Die erzeugten Items laufen wie bei einem normalen Lauf durch
+die Pipelines: Die JSON-Dateien in `parsed/` werden neu geschrieben, die Einträge laufend ins
+Parquet-Archiv übernommen. Die Arbeit wird auf einen
+Prozess-Pool verteilt.
+
+Beispiel:
+    python src/reparse.py DLFNova swr3_playlist --workers 4
+"""
+
+logger = logging.getLogger(__name__)
+
+SKIP_FILES = {SnapshotStore.MANIFEST_NAME, "validators.json"}
+
+REPARSED = "reparsed"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class Snapshot(NamedTuple):
+    spider: str
+    # Dateiname, wie ihn `DownloadSpider.save_response` vergeben hat (inkl. Präfix, ohne .gz)
+    name: str
+    # Zeitpunkt des Abrufs (ISO 8601, UTC)
+    timestamp: str
+    # Datei unter DATA_PATH/<spider>/ bzw. Hash des Blobs im SnapshotStore
+    path: str | None = None
+    blob: str | None = None
+
+
+def list_snapshots(spider_name: str, data_path: str = DATA_PATH) -> list:
+    """Alle gespeicherten Snapshots eines Spiders, nach Abrufzeit sortiert."""
+    time_pattern = re.compile(re.escape(spider_name) + r"_(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\+00:00)")
+    snapshots = []
+
+    directory = os.path.join(data_path, spider_name)
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name in SKIP_FILES or entry.name.endswith(".tmp"):
+                continue
+            matches = time_pattern.search(entry.name)
+            if not matches:
+                continue
+            name = entry.name[:-len(".gz")] if entry.name.endswith(".gz") else entry.name
+            snapshots.append(Snapshot(spider_name, name, matches[1], path=entry.path))
+
+    for entry in SnapshotStore(spider_name, data_path).entries():
+        snapshots.append(Snapshot(spider_name, entry.name, entry.timestamp, blob=entry.blob))
+
+    return sorted(snapshots, key=lambda s: s.timestamp)
+
+
+def read_snapshot(snapshot: Snapshot, data_path: str = DATA_PATH) -> bytes:
+    if snapshot.blob:
+        return SnapshotStore(snapshot.spider, data_path).read(snapshot.blob)
+    if snapshot.path.endswith(".gz"):
+        with gzip.open(snapshot.path, "rb") as f:
+            return f.read()
+    with open(snapshot.path, "rb") as f:
+        return f.read()
+
+
+def build_response(snapshot: Snapshot, body: bytes, meta: dict, data_path: str = DATA_PATH):
+    """
+    Baut aus einem Snapshot ein Response-Objekt, wie es Scrapy an den Callback übergeben hätte.
+    Der Content-Type wird aus der Dateiendung abgeleitet, damit `generate_name` dieselben
+    Dateinamen erzeugt wie beim ursprünglichen Lauf.
+    """
+    location = snapshot.path or SnapshotStore(snapshot.spider, data_path).blob_path(snapshot.blob)
+    url = Path(location).resolve().as_uri()
+    headers = Headers()
+    content_type = mimetypes.guess_type(snapshot.name)[0]
+    if content_type:
+        headers["Content-Type"] = content_type
+    request = Request(url, meta={**meta, "snapshot_time": snapshot.timestamp})
+    response_class = responsetypes.from_args(headers=headers, url=snapshot.name, body=body)
+    return response_class(url=url, body=body, headers=headers, request=request)
+
+
+# eine Spider-Instanz pro Worker-Prozess und Spider
+_spiders = {}
+
+
+def get_replay_spider(spider_name: str):
+    spider = _spiders.get(spider_name)
+    if spider is None:
+        spider = get_spec(spider_name).load()()
+        spider.replay = True
+        _spiders[spider_name] = spider
+    return spider
+
+
+def reparse_snapshot(snapshot: Snapshot, data_path: str = DATA_PATH) -> tuple:
+    """Läuft im Worker-Prozess. Gibt den Status und die erzeugten Items zurück."""
+    spider = get_replay_spider(snapshot.spider)
+    meta = spider.snapshot_meta(snapshot.name)
+    if meta is None:
+        logger.debug(f"Cannot reparse {snapshot.name}, skipping")
+        return SKIPPED, []
+    try:
+        response = build_response(snapshot, read_snapshot(snapshot, data_path), meta, data_path)
+        output = getattr(spider, spider.replay_callback)(response)
+        items = [item for item in iterate_spider_output(output) if isinstance(item, Item)]
+    except Exception as e:
+        logger.error(f"Reparsing {snapshot.name} failed: {e!r}")
+        return FAILED, []
+    return REPARSED, items
+
+
+def init_worker(level: int):
+    logging.basicConfig(format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    logging.getLogger().setLevel(level)
+
+
+def run_reparse(spider_names: list, workers: int | None = None, flush_every: int = 500,
+                data_path: str = DATA_PATH, log_level: int = logging.WARNING) -> Counter:
+    snapshots = [snapshot for name in spider_names for snapshot in list_snapshots(name, data_path)]
+    logger.info(f"Reparsing {len(snapshots)} snapshots of {', '.join(spider_names)}")
+
+    archive_spider = Spider(name="reparse")
+    archive_pipeline = PlaylistArchivePipeline()
+    archive_pipeline.open_spider(archive_spider)
+    # parsed/ liegt pro Spider, daher eine Pipeline je Spider
+    output_spiders = {name: Spider(name=name) for name in spider_names}
+    output_pipelines = {name: ParsedOutputPipeline(data_path, batch_size=flush_every, max_pending=8, fsync=False,
+                                                   background=False)
+                        for name in spider_names}
+    for name, pipeline in output_pipelines.items():
+        pipeline.open_spider(output_spiders[name])
+
+    counts = Counter()
+    started = time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(log_level,)) as executor:
+        results = executor.map(partial(reparse_snapshot, data_path=data_path), snapshots, chunksize=8)
+        for done, (snapshot, (status, items)) in enumerate(zip(snapshots, results), 1):
+            counts[status] += 1
+            for item in items:
+                output_pipelines[snapshot.spider].process_item(item, output_spiders[snapshot.spider])
+                archive_pipeline.process_item(item, archive_spider)
+            if done % flush_every == 0:
+                archive_pipeline.flush(archive_spider)
+                logger.info(f"{done}/{len(snapshots)} snapshots, {done / (time() - started):.1f} files/s")
+    archive_pipeline.flush(archive_spider)
+    for name, pipeline in output_pipelines.items():
+        pipeline.flush(output_spiders[name])
+
+    elapsed = time() - started
+    rate = len(snapshots) / elapsed if elapsed > 0 else 0
+    logger.info(
+        f"Reparse finished: {counts[REPARSED]} reparsed, {counts[SKIPPED]} skipped, {counts[FAILED]} failed "
+        f"in {elapsed:.1f}s ({rate:.1f} files/s)"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gespeicherte Snapshots offline erneut parsen.")
+    parser.add_argument("spiders", nargs="*", default=[spec.name for spec in SPIDERS],
+                        help="Namen der Spider (Standard: alle)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse (Standard: CPU-Anzahl)")
+    parser.add_argument("--flush-every", type=int, default=500,
+                        help="Archiv nach so vielen Snapshots schreiben und Fortschritt ausgeben")
+    parser.add_argument("--verbose", action="store_true", help="Log-Ausgaben der Spider anzeigen")
+    args = parser.parse_args()
+
+    for name in args.spiders:
+        get_spec(name)
+
+    level = logging.INFO if args.verbose else logging.WARNING
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
+    run_reparse(args.spiders, args.workers, args.flush_every, log_level=level)
@@ -0,0 +1,115 @@
+import logging
+from time import time
+
+from scrapy.crawler import CrawlerRunner
+from scrapy.settings import Settings
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.log import configure_logging
+from scrapy.utils.reactor import install_reactor
+from twisted.internet.defer import inlineCallbacks
+
+from main import get_last_runs
+from playwright_contexts import SharedBrowser
+from registry import SPIDERS, adaptive_run_time, get_spec
+from settings import SETTINGS
+from state_store import get_state_store
+
+logger = logging.getLogger(__name__)
+
+
+def next_run_time(last_run: float | None, interval: int, now: float) -> float:
+    """
+    Nächster Startzeitpunkt (Unix-Zeit) eines Spiders.
+    Die Zeitpunkte liegen auf Vielfachen des Intervalls, stündliche Spider laufen
+    also immer zur vollen Stunde, tägliche um 00:00 UTC. Ist der Spider noch nie
+    gelaufen oder wurde ein Termin verpasst, startet er sofort.
+    """
+    if last_run is None:
+        return now
+    boundary = (last_run // interval + 1) * interval
+    return max(now, boundary)
+
+
+class SpiderScheduler:
+    """
+    Residenter Scheduler: ein Reactor, ein warm gehaltenes Chromium und ein
+    `CrawlerRunner`, der jeden Spider zu seinem Intervall startet.
+    Der Zustand liegt wie im Cron-Modus im StateStore und überlebt damit Neustarts.
+    """
+
+    def __init__(self, settings: dict = SETTINGS, browser_port: int | None = 9222):
+        self.settings = dict(settings)
+        self.browser_port = browser_port
+        self.running = set()
+        self.runner = None
+        self.browser = None
+
+    async def launch_browser(self):
+        self.browser = SharedBrowser(self.browser_port)
+        await self.browser.launch()
+        # Alle Crawler verbinden sich per CDP mit diesem Browser, statt einen eigenen zu starten
+        self.settings["PLAYWRIGHT_CDP_URL"] = self.browser.cdp_url
+        logger.info(f"Shared Chromium listening on port {self.browser_port}")
+
+    async def close_browser(self):
+        if self.browser is not None:
+            await self.browser.close()
+
+    @inlineCallbacks
+    def start(self):
+        if self.browser_port:
+            yield deferred_from_coro(self.launch_browser())
+        self.runner = CrawlerRunner(self.settings)
+        last_runs = get_last_runs()
+        for spec in SPIDERS:
+            self.schedule(spec.name, spec.interval, last_runs.get(spec.name))
+
+    @inlineCallbacks
+    def stop(self):
+        if self.runner is not None:
+            yield self.runner.stop()
+        yield deferred_from_coro(self.close_browser())
+
+    def schedule(self, name: str, interval: int, last_run: float | None):
+        from twisted.internet import reactor
+
+        now = time()
+        window = get_state_store().poll_window(name) if get_spec(name).adaptive else None
+        if window is not None:
+            delay = max(now, adaptive_run_time(last_run, *window)) - now
+        else:
+            delay = next_run_time(last_run, interval, now) - now
+        logger.info(f"Next run of {name} in {delay:.0f}s")
+        reactor.callLater(delay, self.fire, name)
+
+    def fire(self, name: str):
+        spec = get_spec(name)
+        if name in self.running:
+            logger.warning(f"Spider {name} is still running, skipping this interval.")
+            self.schedule(name, spec.interval, time())
+            return
+
+        self.running.add(name)
+        # Argumente (z.B. das Datum von gestern) werden bei jedem Start neu berechnet
+        deferred = self.runner.crawl(spec.load(), **spec.get_args())
+
+        def finished(result):
+            self.running.discard(name)
+            self.schedule(name, spec.interval, time())
+            return result
+
+        deferred.addErrback(lambda failure: logger.error(f"Error when running spider {name}: {failure.value}"))
+        deferred.addBoth(finished)
+
+
+def run_daemon(browser_port: int | None = 9222):
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from twisted.internet import reactor
+
+    configure_logging(Settings(SETTINGS))
+    scheduler = SpiderScheduler(SETTINGS, browser_port=browser_port)
+    reactor.callWhenRunning(
+        lambda: scheduler.start().addErrback(lambda failure: logger.error(f"Scheduler failed to start: {failure.value}"))
+    )
+    reactor.addSystemEventTrigger("before", "shutdown", scheduler.stop)
+    reactor.run()
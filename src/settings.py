@@ -3,10 +3,23 @@ from os import path
 SETTINGS = {
     "DOWNLOADER_MIDDLEWARES": {
         #"middlewares.SaveHtmlMiddleware.SaveHtmlMiddleware": 1000
+        "middlewares.ConditionalGetMiddleware.ConditionalGetMiddleware": 900,
+    },
+    "EXTENSIONS": {
+        # nur aktiv, wenn ein Spider AIMD_THROTTLE_ENABLED setzt
+        "extensions.AimdThrottle.AimdThrottle": 0,
+        # Prometheus-Textfile unter DATA_PATH/metrics, abschaltbar mit METRICS_ENABLED
+        "extensions.MetricsExporter.MetricsExporter": 0,
+    },
+    "ITEM_PIPELINES": {
+        "pipelines.ParsedOutputPipeline.ParsedOutputPipeline": 400,
+        "pipelines.PlaylistArchivePipeline.PlaylistArchivePipeline": 500,
+        "pipelines.TimelinePipeline.TimelinePipeline": 600,
     },
     "DOWNLOAD_HANDLERS": {
-        "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
-        "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+        # Playwright wird erst gestartet, wenn eine Anfrage meta["playwright"] setzt
+        "http": "handlers.LazyPlaywrightDownloadHandler.LazyPlaywrightDownloadHandler",
+        "https": "handlers.LazyPlaywrightDownloadHandler.LazyPlaywrightDownloadHandler",
     },
 }
 
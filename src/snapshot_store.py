@@ -0,0 +1,71 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from settings import DATA_PATH
+from snapshot_writer import write_snapshot
+
+
+class ManifestEntry(NamedTuple):
+    timestamp: str
+    blob: str
+    name: str
+    size: int
+
+
+class SnapshotStore:
+    """
+    Inhaltsadressierter Speicher für Roh-Snapshots.
+
+    Jeder Snapshot wird unter seinem SHA-256-Hash einmalig als gzip-Blob in
+    `DATA_PATH/blobs/<xx>/<hash>.gz` abgelegt. Pro Spider führt ein Manifest
+    (`DATA_PATH/<spider>/manifest.jsonl`) Buch, welcher Blob zu welchem Zeitpunkt
+    geladen wurde. Ein unveränderter Snapshot kostet so nur eine Manifest-Zeile.
+    """
+    BLOB_DIRECTORY = "blobs"
+    MANIFEST_NAME = "manifest.jsonl"
+
+    def __init__(self, spider_name: str, data_path: str = DATA_PATH):
+        self.blob_directory = os.path.join(data_path, self.BLOB_DIRECTORY)
+        self.manifest_path = os.path.join(data_path, spider_name, self.MANIFEST_NAME)
+        self.manifest_lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_directory, digest[:2], digest + ".gz")
+
+    def put(self, body: bytes, name: str, timestamp: datetime, compresslevel: int = 6) -> str:
+        """
+        Speichert `body`, falls noch kein Blob mit gleichem Inhalt existiert, und
+        hängt einen Eintrag an das Manifest an. Gibt den Hash des Blobs zurück.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            write_snapshot(path, body, compresslevel)
+
+        entry = ManifestEntry(timestamp.isoformat(timespec="seconds"), digest, name, len(body))
+        with self.manifest_lock:
+            Path(self.manifest_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry._asdict()) + "\n")
+        return digest
+
+    def entries(self) -> Iterator[ManifestEntry]:
+        """Liefert alle Manifest-Einträge in der Reihenfolge, in der sie geschrieben wurden."""
+        if not os.path.isfile(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield ManifestEntry(**json.loads(line))
+
+    def read(self, digest: str) -> bytes:
+        with gzip.open(self.blob_path(digest), "rb") as f:
+            return f.read()
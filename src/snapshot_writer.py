@@ -0,0 +1,99 @@
+import gzip
+import os
+import threading
+
+from twisted.internet.defer import Deferred, DeferredSemaphore, succeed
+from twisted.python.threadpool import ThreadPool
+
+
+def write_snapshot(path: str, body: bytes, compresslevel: int | None = None, fsync: bool = False):
+    """
+    Schreibt einen Snapshot nach `path`, bei gesetztem `compresslevel` gzip-komprimiert.
+    Es wird erst in eine temporäre Datei geschrieben und dann umbenannt, damit nie
+    halbe Dateien liegen bleiben. Mit `fsync` ist die Datei vor dem Umbenennen auf der Platte.
+    """
+    if compresslevel is not None:
+        body = gzip.compress(body, compresslevel=compresslevel)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BackgroundWriter:
+    """
+    Führt Schreibaufträge in einem Thread-Pool außerhalb des Reactors aus.
+
+    `submit` blockiert nie und liefert ein Deferred, das nach dem Schreiben feuert (bzw. mit
+    dem Fehler des Auftrags). Höchstens `max_pending` Aufträge liegen gleichzeitig im Pool,
+    weitere warten in einer `DeferredSemaphore`. Wer Backpressure braucht, wartet auf das
+    Deferred (Pipelines) oder prüft `full` und drosselt selbst (`DownloadSpider` pausiert dann
+    die Engine bis `drained`). `close` feuert, wenn alle Aufträge geschrieben sind.
+    Muss im Reactor-Thread benutzt werden.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = DeferredSemaphore(max_pending)
+        self.threadpool = None
+        self.backlog = 0
+        self.waiters = []
+        self.closed = False
+
+    @property
+    def full(self) -> bool:
+        return self.backlog >= self.max_pending
+
+    def submit(self, fn, *args, **kwargs) -> Deferred:
+        if self.closed:
+            raise RuntimeError("BackgroundWriter is already closed")
+        if self.threadpool is None:
+            # erst beim ersten Auftrag, ein Writer ohne Aufträge startet keine Threads
+            self.threadpool = ThreadPool(minthreads=0, maxthreads=self.max_workers, name="snapshot-writer")
+            self.threadpool.start()
+        self.backlog += 1
+        deferred = self.pending.run(self._run, fn, *args, **kwargs)
+        deferred.addBoth(self._done)
+        return deferred
+
+    def _run(self, fn, *args, **kwargs) -> Deferred:
+        from twisted.internet import reactor
+        from twisted.internet.threads import deferToThreadPool
+
+        return deferToThreadPool(reactor, self.threadpool, fn, *args, **kwargs)
+
+    def _done(self, result):
+        self.backlog -= 1
+        waiters, self.waiters = self.waiters, []
+        for limit, deferred in waiters:
+            if self.backlog <= limit:
+                deferred.callback(None)
+            else:
+                self.waiters.append((limit, deferred))
+        return result
+
+    def drained(self, limit: int = 0) -> Deferred:
+        """Feuert, sobald höchstens `limit` Aufträge offen sind."""
+        if self.backlog <= limit:
+            return succeed(None)
+        deferred = Deferred()
+        self.waiters.append((limit, deferred))
+        return deferred
+
+    def close(self) -> Deferred:
+        self.closed = True
+        deferred = self.drained()
+        deferred.addCallback(lambda _: self._stop_threadpool())
+        return deferred
+
+    def _stop_threadpool(self):
+        if self.threadpool is not None:
+            from twisted.internet.threads import deferToThread
+
+            threadpool, self.threadpool = self.threadpool, None
+            # stop() wartet auf die (leeren) Threads, nicht im Reactor
+            return deferToThread(threadpool.stop)
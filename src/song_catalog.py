@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Iterable
+
+from settings import DATA_PATH
+
+"""
+Senderübergreifender Song-Katalog: jeder Titel bekommt eine stabile Integer-ID.
+
+Titel und Interpret werden vor dem Nachschlagen normalisiert (Unicode-NFKC, Groß-/Kleinschreibung,
+Leerzeichen, Klammern und Schreibweisen von "feat."), sodass z.B. "Song (feat. X)" bei SWR3 und
+"SONG ft X" bei 1LIVE dieselbe ID bekommen. Die Zuordnung liegt in `DATA_PATH/songs.sqlite3`,
+beim Öffnen wird sie komplett in einen Hash-Index im Speicher geladen.
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title_key TEXT NOT NULL,
+    performer_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    performer TEXT NOT NULL,
+    UNIQUE (title_key, performer_key)
+);
+"""
+
+FEATURING = re.compile(r"\b(?:featuring|feat|ft)\b\.?")
+BRACKETS = re.compile(r"[()\[\]{}]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(value: str) -> str:
+    """Schlüssel für Titel bzw. Interpret, unter dem Schreibvarianten zusammenfallen."""
+    value = unicodedata.normalize("NFKC", value).casefold()
+    value = BRACKETS.sub(" ", value)
+    value = FEATURING.sub(" feat. ", value)
+    return WHITESPACE.sub(" ", value).strip()
+
+
+class SongCatalog:
+    """
+    Vergibt und verwaltet die Song-IDs.
+
+    Nachschlagen läuft nur über den Index im Speicher; neue Songs werden in die Datenbank
+    geschrieben und behalten ihre ID für immer. Der Katalog ist thread-sicher, damit ihn
+    die Archiv-Pipeline aus ihrem Schreib-Thread verwenden kann.
+    """
+
+    def __init__(self, path: str = os.path.join(DATA_PATH, "songs.sqlite3")):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self.index = {
+            (title_key, performer_key): song_id
+            for song_id, title_key, performer_key in self.connection.execute(
+                "SELECT id, title_key, performer_key FROM songs"
+            )
+        }
+        # unveränderte Schreibweisen, damit Hits ohne erneutes Normalisieren gefunden werden
+        self.raw_index = {}
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def lookup(self, title: str | None, performer: str | None) -> int | None:
+        """ID eines bekannten Songs, ohne einen neuen anzulegen."""
+        if not title or not performer:
+            return None
+        song_id = self.raw_index.get((title, performer))
+        if song_id is None:
+            song_id = self.index.get((normalize(title), normalize(performer)))
+            if song_id is not None:
+                self.raw_index[(title, performer)] = song_id
+        return song_id
+
+    def intern(self, title: str | None, performer: str | None) -> int | None:
+        return self.intern_many([(title, performer)])[0]
+
+    def intern_many(self, songs: Iterable[tuple]) -> list:
+        """
+        IDs für `(title, performer)`-Paare; unbekannte Songs werden in einer gemeinsamen
+        Transaktion angelegt. Einträge ohne Titel oder Interpret bekommen `None`.
+        """
+        songs = list(songs)
+        ids = [self.lookup(title, performer) for title, performer in songs]
+        keys = [
+            (normalize(title), normalize(performer)) if song_id is None and title and performer else None
+            for song_id, (title, performer) in zip(ids, songs)
+        ]
+        if not any(keys):
+            return ids
+
+        with self.lock, self.connection:
+            for position, key in enumerate(keys):
+                if key is None:
+                    continue
+                song_id = self.index.get(key)
+                if song_id is None:
+                    title, performer = songs[position]
+                    # ein anderer Prozess (z.B. der Daemon) kann den Song inzwischen angelegt haben
+                    self.connection.execute(
+                        "INSERT OR IGNORE INTO songs (title_key, performer_key, title, performer) VALUES (?, ?, ?, ?)",
+                        (key[0], key[1], title.strip(), performer.strip()),
+                    )
+                    song_id = self.connection.execute(
+                        "SELECT id FROM songs WHERE title_key = ? AND performer_key = ?", key
+                    ).fetchone()[0]
+                    self.index[key] = song_id
+                self.raw_index[songs[position]] = song_id
+                ids[position] = song_id
+        return ids
+
+    def get(self, song_id: int) -> tuple | None:
+        """Titel und Interpret in der Schreibweise, in der der Song zuerst gesehen wurde."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT title, performer FROM songs WHERE id = ?", (song_id,)
+            ).fetchone()
+
+
+_catalog: SongCatalog | None = None
+
+
+def get_song_catalog() -> SongCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = SongCatalog()
+    return _catalog
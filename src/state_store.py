@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from settings import DATA_PATH
+
+# Stunde für Slots, die einen ganzen Tag abdecken (z.B. SRF3-Playlist)
+DAY_SLOT = -1
+
+SLOT_DONE = "done"
+SLOT_EMPTY = "empty"
+SLOT_FAILED = "failed"
+
+RUN_RUNNING = "running"
+RUN_FINISHED = "finished"
+RUN_PARTIAL = "partial"
+# Prozess der Spider-Gruppe wurde nach Ablauf ihres Timeouts beendet bzw. ist abgestürzt
+RUN_TIMEOUT = "timeout"
+RUN_CRASHED = "crashed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spider TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_spider_status ON runs (spider, status, started_at);
+CREATE TABLE IF NOT EXISTS slots (
+    spider TEXT NOT NULL,
+    date TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (spider, date, hour)
+);
+CREATE TABLE IF NOT EXISTS poll_windows (
+    source TEXT PRIMARY KEY,
+    window REAL NOT NULL,
+    observed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    source TEXT PRIMARY KEY,
+    value REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _now() -> float:
+    return datetime.now(timezone.utc).timestamp()
+
+
+class StateStore:
+    """
+    Crawl-Zustand in einer eingebetteten SQLite-Datenbank (`DATA_PATH/state.sqlite3`).
+
+    Speichert jeden Lauf eines Spiders mit Status sowie pro `(spider, date, hour)`-Slot,
+    ob er erfolgreich geladen wurde, inklusive Byte- und Item-Anzahl. Für inkrementell
+    geladene Quellen steht in `watermarks` der Zeitpunkt des neuesten übernommenen
+    Eintrags, für adaptiv abgefragte Quellen in `poll_windows` die zuletzt beobachtete
+    Zeitspanne der Seite. Jede Änderung läuft in einer eigenen Transaktion.
+    """
+
+    def __init__(self, path: str = os.path.join(DATA_PATH, "state.sqlite3")):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def start_run(self, spider: str) -> int:
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (spider, started_at, status) VALUES (?, ?, ?)",
+                (spider, _now(), RUN_RUNNING),
+            )
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int, status: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE runs SET finished_at = ?, status = ? WHERE id = ?",
+                (_now(), status, run_id),
+            )
+
+    def abort_runs(self, spiders: list, since: float, status: str) -> int:
+        """Setzt alle seit `since` gestarteten, noch laufenden Läufe von `spiders` auf `status`."""
+        with self.lock, self.connection:
+            cursor = self.connection.executemany(
+                "UPDATE runs SET finished_at = ?, status = ? WHERE spider = ? AND status = ? AND started_at >= ?",
+                [(_now(), status, spider, RUN_RUNNING, since) for spider in spiders],
+            )
+            return cursor.rowcount
+
+    def last_successful_runs(self) -> dict:
+        """Startzeit (Unix-Zeit) des letzten vollständig erfolgreichen Laufs pro Spider."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT spider, MAX(started_at) FROM runs WHERE status = ? GROUP BY spider",
+                (RUN_FINISHED,),
+            ).fetchall()
+        return {spider: started_at for spider, started_at in rows}
+
+    def mark_slot(self, spider: str, date: str, hour: int, status: str, bytes: int = 0, items: int = 0):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO slots (spider, date, hour, status, bytes, items, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (spider, date, hour) DO UPDATE SET "
+                "status = excluded.status, bytes = excluded.bytes, items = excluded.items, updated_at = excluded.updated_at",
+                (spider, date, hour, status, bytes, items, _now()),
+            )
+
+    def completed_hours(self, spider: str, date: str) -> set:
+        """Alle Stunden eines Datums, die bereits erfolgreich geladen wurden."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT hour FROM slots WHERE spider = ? AND date = ? AND status = ?",
+                (spider, date, SLOT_DONE),
+            ).fetchall()
+        return {hour for (hour,) in rows}
+
+    def slots(self, spider: str, status: str | None = None) -> list:
+        query = "SELECT date, hour, status, bytes, items FROM slots WHERE spider = ?"
+        params = [spider]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        with self.lock:
+            return self.connection.execute(query + " ORDER BY date, hour", params).fetchall()
+
+    def watermark(self, source: str) -> float | None:
+        """Unix-Zeit des neuesten bereits übernommenen Eintrags von `source`."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM watermarks WHERE source = ?", (source,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def advance_watermarks(self, watermarks: dict):
+        """Setzt `{source: unix_zeit}`; ein Wasserstand wird dabei nie zurückgesetzt."""
+        if not watermarks:
+            return
+        now = _now()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO watermarks (source, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET "
+                "value = MAX(value, excluded.value), updated_at = excluded.updated_at",
+                [(source, value, now) for source, value in watermarks.items()],
+            )
+
+    def poll_window(self, source: str) -> tuple | None:
+        """`(window, observed_at)`: Zeitspanne (Sekunden), die die Seite beim letzten Abruf zeigte, und wann."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT window, observed_at FROM poll_windows WHERE source = ?", (source,)
+            ).fetchone()
+
+    def record_poll_window(self, source: str, window: float, observed_at: float):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO poll_windows (source, window, observed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET window = excluded.window, observed_at = excluded.observed_at",
+                (source, window, observed_at),
+            )
+
+    def import_last_runs(self, path: str):
+        """Übernimmt einmalig die Zeitstempel aus dem alten `last_runs.json`."""
+        if not os.path.isfile(path):
+            return
+        with self.lock:
+            has_runs = self.connection.execute("SELECT 1 FROM runs LIMIT 1").fetchone()
+        if has_runs:
+            return
+        with open(path, "r") as f:
+            try:
+                last_runs = json.load(f)
+            except Exception:
+                return
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO runs (spider, started_at, finished_at, status) VALUES (?, ?, ?, ?)",
+                [(spider, time, time, RUN_FINISHED) for spider, time in last_runs.items()],
+            )
+
+
+_state_store: StateStore | None = None
+
+
+def get_state_store() -> StateStore:
+    """Gemeinsame StateStore-Instanz für alle Spider eines Prozesses."""
+    global _state_store
+    if _state_store is None:
+        _state_store = StateStore()
+    return _state_store
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import archive
+from settings import DATA_PATH
+from song_catalog import get_song_catalog
+
+"""
+Kanonische Zeitleiste pro Sender: jeder gespielte Titel genau einmal, nach Zeit sortiert.
+
+WDR und DLF Nova liefern sich überlappende Listen (die letzten Stunden bzw. den ganzen Tag),
+derselbe Titel steht deshalb in vielen Dateien unter `parsed/`. Jeder neue Batch wird in die
+Zeitleiste des Senders eingefaltet: ein Eintrag gilt als doppelt, wenn derselbe Song (ID aus
+dem Song-Katalog) innerhalb von `DEDUPE_WINDOW` Sekunden schon vorkommt. Zusätzlich merkt
+sich die Zeitleiste, welche Zeiträume die Batches abgedeckt haben; was dazwischen fehlt
+(z.B. weil ein Lauf ausgefallen ist), wird als Lücke gemeldet.
+
+Gespeichert wird unter `DATA_PATH/timeline/<sender>.parquet` plus `<sender>.coverage.json`.
+
+Beispiel:
+    python src/timeline.py build wdr2 1live DLFNova
+    python src/timeline.py gaps wdr2 --min-gap 20
+"""
+
+TIMELINE_DIRECTORY = os.path.join(DATA_PATH, "timeline")
+
+SCHEMA = pa.schema([
+    ("datetime", pa.timestamp("s", tz="UTC")),
+    ("song_id", pa.int32()),
+    ("title", pa.string()),
+    ("performer", pa.string()),
+])
+
+# derselbe Song innerhalb dieses Abstands (Sekunden) ist derselbe Einsatz, nur anders gerundet
+DEDUPE_WINDOW = 60
+# kürzere unabgedeckte Abstände sind normale Titelwechsel zwischen zwei Abrufen, keine Lücken
+DEFAULT_MIN_GAP = 15 * 60
+
+# Dateien unter parsed/ mit diesem Präfix gehören zu einem eigenen Sender (NRW-Lokalradios)
+STATION_PREFIX = re.compile(r"station(\d+)_")
+
+
+class TimelineEntry(NamedTuple):
+    timestamp: int
+    song_id: int | None
+    title: str | None
+    performer: str | None
+
+    def key(self):
+        # ohne Song-ID (Titel oder Interpret fehlt) zählt die unveränderte Schreibweise
+        return self.song_id if self.song_id is not None else (self.title, self.performer)
+
+
+class Timeline:
+    """
+    Zeitleiste eines Senders im Speicher.
+
+    Einträge und Zeitstempel liegen in parallelen, sortierten Listen; Dubletten werden per
+    Binärsuche im Fenster `timestamp ± window` gefunden (O(log n + k)). Neue Einträge sind
+    fast immer die jüngsten und werden dann nur angehängt. Abgedeckte Zeiträume liegen als
+    sortierte, disjunkte `[start, end]`-Intervalle in `coverage`.
+    """
+
+    def __init__(self, station: str, entries: Iterable[TimelineEntry] = (), coverage: Iterable = (),
+                 window: int = DEDUPE_WINDOW):
+        self.station = station
+        self.window = window
+        self.entries = sorted(entries)
+        self.timestamps = [entry.timestamp for entry in self.entries]
+        self.coverage = []
+        for start, end in coverage:
+            self.cover(start, end)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def is_duplicate(self, entry: TimelineEntry) -> bool:
+        lo = bisect_left(self.timestamps, entry.timestamp - self.window)
+        hi = bisect_right(self.timestamps, entry.timestamp + self.window)
+        key = entry.key()
+        return any(self.entries[i].key() == key for i in range(lo, hi))
+
+    def insert(self, entry: TimelineEntry) -> bool:
+        """Fügt `entry` ein, sofern es kein Duplikat ist."""
+        if self.is_duplicate(entry):
+            return False
+        if not self.timestamps or entry.timestamp >= self.timestamps[-1]:
+            self.timestamps.append(entry.timestamp)
+            self.entries.append(entry)
+        else:
+            position = bisect_right(self.timestamps, entry.timestamp)
+            self.timestamps.insert(position, entry.timestamp)
+            self.entries.insert(position, entry)
+        return True
+
+    def cover(self, start: int, end: int):
+        """Markiert `[start, end]` als abgedeckt und verschmilzt überlappende Intervalle."""
+        if end < start:
+            return
+        lo = bisect_left([interval_end for _, interval_end in self.coverage], start)
+        hi = bisect_right([interval_start for interval_start, _ in self.coverage], end)
+        if lo < hi:
+            start = min(start, self.coverage[lo][0])
+            end = max(end, self.coverage[hi - 1][1])
+        self.coverage[lo:hi] = [(start, end)]
+
+    def fold(self, entries: Iterable[TimelineEntry], start: int | None = None, end: int | None = None) -> int:
+        """
+        Faltet einen Batch ein und gibt die Anzahl neuer Einträge zurück. Der Batch deckt
+        `[start, end]` ab, ohne Angabe die Spanne seiner Einträge.
+        """
+        added = 0
+        first = last = None
+        for entry in entries:
+            added += self.insert(entry)
+            first = entry.timestamp if first is None else min(first, entry.timestamp)
+            last = entry.timestamp if last is None else max(last, entry.timestamp)
+        start = first if start is None else start
+        end = last if end is None else end
+        if start is not None and end is not None:
+            self.cover(start, end)
+        return added
+
+    def gaps(self, min_gap: int = DEFAULT_MIN_GAP, start: int | None = None, end: int | None = None) -> list:
+        """Nicht abgedeckte Zeiträume `(start, end)` zwischen den Batches, die länger als `min_gap` sind."""
+        gaps = []
+        for (_, previous_end), (next_start, _) in zip(self.coverage, self.coverage[1:]):
+            if next_start - previous_end <= min_gap:
+                continue
+            if (start is not None and next_start < start) or (end is not None and previous_end > end):
+                continue
+            gaps.append((previous_end, next_start))
+        return gaps
+
+    def between(self, start: int, end: int) -> list:
+        """Einträge mit `start <= timestamp < end`."""
+        return self.entries[bisect_left(self.timestamps, start):bisect_left(self.timestamps, end)]
+
+
+def timeline_path(station: str, directory: str = TIMELINE_DIRECTORY) -> str:
+    return os.path.join(directory, f"{station}.parquet")
+
+
+def coverage_path(station: str, directory: str = TIMELINE_DIRECTORY) -> str:
+    return os.path.join(directory, f"{station}.coverage.json")
+
+
+def load_timeline(station: str, directory: str = TIMELINE_DIRECTORY) -> Timeline:
+    entries = []
+    path = timeline_path(station, directory)
+    if os.path.isfile(path):
+        table = pq.read_table(path).cast(SCHEMA)
+        entries = [
+            TimelineEntry(int(dt.timestamp()), song_id, title, performer)
+            for dt, song_id, title, performer in zip(*(table.column(name).to_pylist() for name in SCHEMA.names))
+        ]
+    coverage = []
+    path = coverage_path(station, directory)
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            coverage = json.load(f)
+    return Timeline(station, entries, coverage)
+
+
+def save_timeline(timeline: Timeline, directory: str = TIMELINE_DIRECTORY):
+    """Schreibt Zeitleiste und Abdeckung, jeweils über eine temporäre Datei."""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    table = pa.table({
+        "datetime": pa.array([entry.timestamp for entry in timeline.entries], pa.int64()).cast(SCHEMA.field("datetime").type),
+        "song_id": pa.array([entry.song_id for entry in timeline.entries], pa.int32()),
+        "title": pa.array([entry.title for entry in timeline.entries], pa.string()),
+        "performer": pa.array([entry.performer for entry in timeline.entries], pa.string()),
+    })
+    path = timeline_path(timeline.station, directory)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+    path = coverage_path(timeline.station, directory)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump([list(interval) for interval in timeline.coverage], f)
+    os.replace(path + ".tmp", path)
+
+
+def make_entries(rows: list) -> list:
+    """`TimelineEntry`s aus Dicts mit `datetime` (UTC), `title` und `performer`, inklusive Song-ID."""
+    song_ids = get_song_catalog().intern_many((row.get("title"), row.get("performer")) for row in rows)
+    return [
+        TimelineEntry(int(row["datetime"].timestamp()), song_id, row.get("title"), row.get("performer"))
+        for row, song_id in zip(rows, song_ids)
+    ]
+
+
+def read_parsed_file(path: str) -> list:
+    """Einträge einer JSON-Datei unter `parsed/`; Zeilen ohne gültigen Zeitstempel fallen weg."""
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError:
+            return []
+    rows = []
+    for row in data if isinstance(data, list) else ():
+        try:
+            dt = archive.parse_datetime(row["datetime"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows.append({"datetime": dt, "title": row.get("title"), "performer": row.get("performer")})
+    return rows
+
+
+def build(spider_name: str, data_path: str = DATA_PATH, directory: str = TIMELINE_DIRECTORY) -> dict:
+    """Faltet alle Dateien unter `parsed/` eines Spiders neu in die Zeitleisten ein."""
+    parsed_directory = os.path.join(data_path, spider_name, "parsed")
+    timelines = {}
+    files = sorted(os.listdir(parsed_directory)) if os.path.isdir(parsed_directory) else []
+    for name in files:
+        if not name.endswith(".json"):
+            continue
+        matches = STATION_PREFIX.match(name)
+        station = f"{spider_name}_{matches[1]}" if matches else spider_name
+        rows = read_parsed_file(os.path.join(parsed_directory, name))
+        if not rows:
+            continue
+        if station not in timelines:
+            timelines[station] = Timeline(station)
+        timelines[station].fold(make_entries(rows))
+    for timeline in timelines.values():
+        save_timeline(timeline, directory)
+    return timelines
+
+
+def format_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).astimezone(archive.DEFAULT_ZONE).isoformat(timespec="minutes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplizierte Zeitleisten pro Sender aufbauen und Lücken melden.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    build_parser = subparsers.add_parser("build", help="Zeitleisten aus allen parsed/-Dateien neu aufbauen")
+    build_parser.add_argument("spiders", nargs="+")
+    gaps_parser = subparsers.add_parser("gaps", help="Lücken einer Zeitleiste ausgeben")
+    gaps_parser.add_argument("station")
+    gaps_parser.add_argument("--min-gap", type=int, default=DEFAULT_MIN_GAP // 60, help="Minuten (Standard: 15)")
+    gaps_parser.add_argument("--days", type=int, help="nur Lücken der letzten N Tage")
+    args = parser.parse_args()
+
+    if args.mode == "build":
+        for spider_name in args.spiders:
+            for station, timeline in build(spider_name).items():
+                print(f"{station}: {len(timeline)} entries, {len(timeline.gaps())} gaps")
+    else:
+        timeline = load_timeline(args.station)
+        start = None
+        if args.days:
+            start = int((datetime.now(timezone.utc) - timedelta(days=args.days)).timestamp())
+        for gap_start, gap_end in timeline.gaps(args.min_gap * 60, start=start):
+            sys.stdout.write(f"{format_time(gap_start)} - {format_time(gap_end)}  ({(gap_end - gap_start) // 60} min)\n")
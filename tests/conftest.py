@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def reactor():
+    """
+    Ein Asyncio-Reactor (wie in main.py) in einem Hintergrund-Thread für die ganze Session.
+    Tests rufen Code im Reactor über `run_in_reactor` auf.
+    """
+    from scrapy.utils.reactor import install_reactor
+
+    install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+    from twisted.internet import reactor
+
+    thread = threading.Thread(target=reactor.run, kwargs={"installSignalHandlers": False}, daemon=True)
+    thread.start()
+    yield reactor
+    reactor.callFromThread(reactor.stop)
+    thread.join(5)
+
+
+@pytest.fixture
+def run_in_reactor(reactor):
+    """Führt `fn` im Reactor-Thread aus und wartet auf das Ergebnis (auch auf Deferreds)."""
+    from twisted.internet.threads import blockingCallFromThread
+
+    def run(fn, *args, **kwargs):
+        return blockingCallFromThread(reactor, fn, *args, **kwargs)
+
+    return run
+
+
+@pytest.fixture
+def state_store(tmp_path, monkeypatch):
+    """Frischer StateStore unter `tmp_path` statt `DATA_PATH/state.sqlite3`."""
+    import state_store as module
+
+    store = module.StateStore(str(tmp_path / "state.sqlite3"))
+    monkeypatch.setattr(module, "_state_store", store)
+    yield store
+    store.close()
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from extraction import iter_json_array
+
+
+@pytest.mark.parametrize("text", [
+    "[]",
+    " [ ] ",
+    '[{"a": 1}]',
+    '[1, "two", [3], {"four": [4, {"x": null}]}, true]',
+    '\n[\n  {"title": "Eins, zwei", "artist": "]["},\n  {"title": "Drei"}\n]\n',
+])
+def test_iter_json_array_matches_json_loads(text):
+    assert list(iter_json_array(text)) == json.loads(text)
+
+
+def test_iter_json_array_yields_before_a_broken_element():
+    values = iter_json_array('[{"a": 1}, {"b": ]')
+    assert next(values) == {"a": 1}
+    with pytest.raises(ValueError):
+        next(values)
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', "", '[1 2]', '[1,'])
+def test_iter_json_array_rejects_other_documents(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(text))
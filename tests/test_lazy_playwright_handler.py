@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from handlers.LazyPlaywrightDownloadHandler import launch_playwright_handler
+
+
+class FakeHandler:
+    def __init__(self):
+        self.launched = False
+
+    async def _launch(self):
+        self.launched = True
+
+
+def test_launch_calls_private_launch():
+    handler = FakeHandler()
+    asyncio.run(launch_playwright_handler(handler))
+    assert handler.launched
+
+
+def test_launch_without_private_launch_fails_clearly():
+    with pytest.raises(RuntimeError, match="scrapy-playwright==0.0.43"):
+        asyncio.run(launch_playwright_handler(object()))
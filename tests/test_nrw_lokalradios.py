@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from scrapy.http import Request, TextResponse
+
+import NRWLokalradiosSpider as module
+from NRWLokalradiosSpider import LEGACY_STATION, NRW_ZONE, NRWLokalradiosSpider
+from items import PlaylistItem
+from state_store import DAY_SLOT, SLOT_DONE, SLOT_FAILED
+
+DAY = "2024-05-01"
+START = datetime(2024, 5, 1, tzinfo=NRW_ZONE)
+
+
+def rows(count: int, offset: int = 0) -> list:
+    return [
+        {"timeslot_iso": (START + timedelta(minutes=offset + i)).isoformat(), "title": f"Title {offset + i}", "artist": "Artist"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def spider(state_store, monkeypatch):
+    monkeypatch.setattr(module, "PAGE_SIZE", 3)
+    monkeypatch.setattr(module, "MAX_PAGES", 3)
+    spider = NRWLokalradiosSpider()
+    monkeypatch.setattr(spider, "save_response", lambda *args, **kwargs: None)
+    return spider
+
+
+def response(data: list, page: int = 1, **meta) -> TextResponse:
+    request = Request(f"{module.API_URL}?page={page}", meta={
+        "station": LEGACY_STATION, "day": DAY, "start": START, "end": START + timedelta(days=1), "page": page, **meta,
+    })
+    return TextResponse(request.url, body=json.dumps(data).encode(), encoding="utf-8", request=request)
+
+
+def parse(spider, response) -> tuple:
+    output = list(spider.parse(response))
+    spider.store_slots(spider.take_pending_slots())
+    items = [item for item in output if isinstance(item, PlaylistItem)]
+    requests = [request for request in output if isinstance(request, Request)]
+    return items, requests
+
+
+def day_status(state_store) -> str:
+    return state_store.slots("NRWLokalradios")[0][2]
+
+
+def test_short_page_completes_the_day(spider, state_store):
+    items, requests = parse(spider, response(rows(2)))
+    assert len(items) == 2 and not requests
+    assert day_status(state_store) == SLOT_DONE
+
+
+def test_full_page_requests_the_next_one(spider, state_store):
+    items, requests = parse(spider, response(rows(3)))
+    assert len(items) == 3
+    assert [request.meta["page"] for request in requests] == [2]
+    assert "page=2" in requests[0].url and "pagesize=3" in requests[0].url
+    assert state_store.slots("NRWLokalradios") == []
+
+    items, requests = parse(spider, response(rows(1, offset=3), page=2, **requests[0].meta))
+    assert len(items) == 1 and not requests
+    assert state_store.slots("NRWLokalradios")[0][2:] == (SLOT_DONE, 0, 4)
+
+
+def test_repeated_page_fails_the_day(spider, state_store):
+    _, requests = parse(spider, response(rows(3)))
+    _, requests = parse(spider, response(rows(3), page=2, **requests[0].meta))
+    assert not requests
+    assert day_status(state_store) == SLOT_FAILED
+    assert spider.failed_slots == 1
+
+
+def test_max_pages_fails_the_day(spider, state_store):
+    meta = {}
+    for page in range(1, 4):
+        _, requests = parse(spider, response(rows(3, offset=3 * page), page=page, **meta))
+        meta = requests[0].meta if requests else {}
+    assert not requests
+    assert day_status(state_store) == SLOT_FAILED
+
+
+def test_rows_up_to_the_watermark_are_skipped(spider, state_store):
+    state_store.advance_watermarks({"NRWLokalradios": (START + timedelta(minutes=1)).timestamp()})
+    items, _ = parse(spider, response(rows(2)))
+    assert [item["title"] for item in items] == []
+    items, _ = parse(spider, response(rows(2, offset=1)))
+    assert [item["title"] for item in items] == ["Title 2"]
@@ -0,0 +1,73 @@
+import json
+
+from twisted.internet.defer import inlineCallbacks
+
+from DownloadSpider import DownloadSpider
+from items import PlaylistItem
+from pipelines.ParsedOutputPipeline import ParsedOutputPipeline
+from state_store import DAY_SLOT, SLOT_DONE, SLOT_FAILED
+
+
+class PlaylistSpider(DownloadSpider):
+    name = "playlist"
+
+
+def make_item(minute: int) -> PlaylistItem:
+    return PlaylistItem(
+        datetime=f"2024-05-01T10:{minute:02d}:00+02:00",
+        title=f"Title {minute}",
+        performer="Performer",
+        source="playlist",
+        parsed_file="2024-05-01.json",
+    )
+
+
+def test_items_wait_for_their_batch_and_slots_follow_the_write(tmp_path, state_store, run_in_reactor):
+    spider = PlaylistSpider()
+    pipeline = ParsedOutputPipeline(str(tmp_path), batch_size=2, max_pending=1, fsync=False)
+
+    @inlineCallbacks
+    def scenario():
+        pipeline.open_spider(spider)
+        assert pipeline.process_item(make_item(0), spider) is not None
+        spider.mark_slot("2024-05-01", DAY_SLOT, SLOT_DONE, items=2)
+        result = pipeline.process_item(make_item(1), spider)
+        # der Batch ist voll: das Item kommt erst nach dem Schreiben zurück
+        assert hasattr(result, "addCallback")
+        assert state_store.slots("playlist") == []
+        item = yield result
+        assert item["title"] == "Title 1"
+        assert state_store.slots("playlist", SLOT_DONE) == [("2024-05-01", DAY_SLOT, SLOT_DONE, 0, 2)]
+        pipeline.process_item(make_item(2), spider)
+        yield pipeline.close_spider(spider)
+
+    run_in_reactor(scenario)
+    with open(tmp_path / "playlist" / "parsed" / "2024-05-01.json", encoding="utf-8") as f:
+        rows = json.load(f)
+    assert [row["title"] for row in rows] == ["Title 0", "Title 1", "Title 2"]
+
+
+def test_failed_write_fails_the_slots(tmp_path, state_store, run_in_reactor):
+    spider = PlaylistSpider()
+    # parsed/ kann nicht angelegt werden, weil an der Stelle eine Datei liegt
+    (tmp_path / "playlist").write_text("")
+    pipeline = ParsedOutputPipeline(str(tmp_path), batch_size=1, max_pending=1, fsync=False)
+
+    @inlineCallbacks
+    def scenario():
+        pipeline.open_spider(spider)
+        spider.mark_slot("2024-05-01", DAY_SLOT, SLOT_DONE, items=1)
+        try:
+            yield pipeline.process_item(make_item(0), spider)
+        except OSError:
+            pass
+        spider.mark_slot("2024-05-02", DAY_SLOT, SLOT_DONE, items=1)
+        yield pipeline.close_spider(spider)
+        spider.store_slots(spider.take_pending_slots())
+
+    run_in_reactor(scenario)
+    assert [slot[:3] for slot in state_store.slots("playlist")] == [
+        ("2024-05-01", DAY_SLOT, SLOT_FAILED),
+        ("2024-05-02", DAY_SLOT, SLOT_FAILED),
+    ]
+    assert spider.failed_slots == 2
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from twisted.internet.defer import DeferredList, inlineCallbacks
+from twisted.internet.task import LoopingCall
+
+from snapshot_writer import BackgroundWriter, write_snapshot
+
+
+def slow_write(delay: float, done: list, value):
+    time.sleep(delay)
+    done.append(value)
+    return value
+
+
+def test_submit_does_not_block_the_reactor(reactor, run_in_reactor):
+    """
+    20 Aufträge à 50 ms bei 2 Threads und max_pending=2: Das frühere blockierende `submit`
+    hielt den Reactor dabei rund 450 ms fest, jetzt kehrt es sofort zurück und der Reactor
+    tickt weiter.
+    """
+    done = []
+    ticks = []
+
+    @inlineCallbacks
+    def scenario():
+        writer = BackgroundWriter(max_workers=2, max_pending=2)
+        ticker = LoopingCall(lambda: ticks.append(time.perf_counter()))
+        ticker.start(0.01)
+        started = time.perf_counter()
+        deferreds = [writer.submit(slow_write, 0.05, done, i) for i in range(20)]
+        submit_time = time.perf_counter() - started
+        assert writer.full
+        results = yield DeferredList(deferreds, fireOnOneErrback=True)
+        yield writer.close()
+        ticker.stop()
+        return submit_time, [value for _, value in results]
+
+    submit_time, results = run_in_reactor(scenario)
+    assert results == list(range(20))
+    assert sorted(done) == list(range(20))
+    assert submit_time < 0.05
+    stall = max(b - a for a, b in zip(ticks, ticks[1:]))
+    assert stall < 0.1
+
+
+def test_drained_fires_below_limit(run_in_reactor):
+    release = threading.Event()
+
+    @inlineCallbacks
+    def scenario():
+        writer = BackgroundWriter(max_workers=1, max_pending=4)
+        for i in range(4):
+            writer.submit(release.wait, 5)
+        drained = []
+        writer.drained(1).addCallback(drained.append)
+        assert writer.full and not drained
+        release.set()
+        yield writer.close()
+        return drained
+
+    assert run_in_reactor(scenario) == [None]
+
+
+def test_failed_job_fails_its_deferred(run_in_reactor):
+    def fail():
+        raise OSError("disk full")
+
+    @inlineCallbacks
+    def scenario():
+        writer = BackgroundWriter()
+        try:
+            yield writer.submit(fail)
+        except OSError as e:
+            error = str(e)
+        yield writer.close()
+        return error, writer.backlog
+
+    assert run_in_reactor(scenario) == ("disk full", 0)
+
+
+def test_write_snapshot_compresses(tmp_path):
+    import gzip
+
+    path = tmp_path / "snapshot.html.gz"
+    write_snapshot(str(path), b"<html></html>", compresslevel=6)
+    assert gzip.decompress(path.read_bytes()) == b"<html></html>"
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot.html.gz"]
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from DownloadSpider import DownloadSpider
+from state_store import RUN_FINISHED, RUN_PARTIAL
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class IncrementalSpider(DownloadSpider):
+    name = "incremental"
+
+
+def run(spider_events: list, reason: str = "finished", failed: bool = False) -> IncrementalSpider:
+    spider = IncrementalSpider()
+    spider.spider_opened(spider)
+    for value in spider_events:
+        spider.raise_watermark(value)
+    if failed:
+        spider.mark_slot("2024-05-01", 10, "failed")
+    spider.finish_run(reason)
+    return spider
+
+
+def test_advance_watermarks_never_moves_backwards(state_store):
+    state_store.advance_watermarks({"a": 100.0, "b": 50.0})
+    state_store.advance_watermarks({"a": 90.0, "b": 60.0})
+    assert state_store.watermark("a") == 100.0
+    assert state_store.watermark("b") == 60.0
+    assert state_store.watermark("c") is None
+
+
+def test_raise_watermark_keeps_the_newest_value(state_store):
+    run([T0 + timedelta(minutes=5), T0, T0 + timedelta(minutes=3)])
+    assert state_store.watermark("incremental") == (T0 + timedelta(minutes=5)).timestamp()
+    run([T0 + timedelta(minutes=1)])
+    assert state_store.watermark("incremental") == (T0 + timedelta(minutes=5)).timestamp()
+
+
+def test_watermark_stays_put_after_a_partial_run(state_store):
+    run([T0])
+    spider = run([T0 + timedelta(hours=1)], failed=True)
+    assert state_store.watermark("incremental") == T0.timestamp()
+    assert spider.get_watermark() == T0
+    statuses = [status for (status,) in state_store.connection.execute("SELECT status FROM runs ORDER BY id")]
+    assert statuses == [RUN_FINISHED, RUN_PARTIAL]
+
+
+def test_watermark_stays_put_after_an_aborted_run(state_store):
+    run([T0 + timedelta(hours=1)], reason="shutdown")
+    assert state_store.watermark("incremental") is None